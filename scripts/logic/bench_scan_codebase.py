@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+# (C) 2025 Jonas Zeihe, MIT License. Developer: Jonas Zeihe. Contact: JonasZeihe@gmail.com
+
+import os
+import io
+import re
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import subprocess
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scan_codebase as scan
+
+LEGACY_IMPORT_PATTERNS = [
+    re.compile(r"(?m)^\s*import\s+[^'\"\n;]*\sfrom\s+['\"]([^'\"\n]+)['\"]"),
+    re.compile(r"(?m)^\s*import\s+['\"]([^'\"\n]+)['\"]"),
+    re.compile(r"(?m)^\s*export\s+[^'\"\n;]*\sfrom\s+['\"]([^'\"\n]+)['\"]"),
+    re.compile(r"require\(\s*['\"]([^'\"\n]+)['\"]\s*\)"),
+]
+
+
+def legacy_parse_import_specs(text):
+    specs = []
+    for pattern in LEGACY_IMPORT_PATTERNS:
+        for m in pattern.finditer(text):
+            specs.append(m.group(1))
+    return specs
+
+
+def synth_tsx_module(rng, index):
+    name = f"Widget{index}"
+    deps = rng.sample(range(max(index, 1) + 40), 6)
+    lines = [
+        "// (C) synthetic benchmark module",
+        "import React, { useMemo, useState } from 'react'",
+        "import styled from 'styled-components'",
+        "import {",
+        f"  Card{deps[0]},",
+        f"  Grid{deps[1]}, // keeps layout in sync with './legacy'",
+        f"}} from '@/components/primitives/Card{deps[0]}'",
+        f"import type {{ Meta{deps[2]} }} from '@/lib/blog/types{deps[2]}'",
+        f"import {{ helper{deps[3]} }} from '../utils/helper{deps[3]}'",
+        f"export {{ default as Alias{index} }} from './alias{deps[4]}'",
+        "",
+        "/*",
+        " * import Nothing from 'inside-a-comment'",
+        " */",
+        f"const Wrapper{index} = styled.section`",
+        "  display: grid;",
+        "  gap: ${({ theme }) => theme.spacing(2)};",
+        "  color: ${({ theme }) => theme.semantic.fg};",
+        "`",
+        "",
+        f"const pattern{index} = /['\"]?[a-z0-9-]+\\/slug/gi",
+        "",
+        f"export default function {name}({{ items }}: {{ items: string[] }}) {{",
+        "  const [open, setOpen] = useState(false)",
+        "  const total = useMemo(() => items.length / 2, [items])",
+        f"  const Lazy = React.lazy(() => import('./lazy/Panel{deps[5]}'))",
+        "  return (",
+        f"    <Wrapper{index} data-open={{open ? 'yes' : 'no'}}>",
+        '      <p>Don\'t import "this" from the markup</p>',
+        "      {items.map((item) => (",
+        '        <span key={item} className="item">{item}</span>',
+        "      ))}",
+        "      <button onClick={() => setOpen(!open)}>{total}</button>",
+        "    </Wrapper" + str(index) + ">",
+        "  )",
+        "}",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def synth_tsx(modules, seed=0):
+    rng = random.Random(seed)
+    return "\n".join(synth_tsx_module(rng, i) for i in range(modules))
+
+
+def legacy_split_line_ranges(lines, rel_path):
+    ranges = []
+    start = 0
+    n = len(lines)
+    header = f"// --- {rel_path} ---"
+    while start < n:
+        end = start
+        last_blank = None
+        while end < n:
+            text = header + "\n" + "\n".join(lines[start : end + 1])
+            if scan.block_bytes(text) > scan.HARD_LIMIT:
+                break
+            if not lines[end].strip():
+                last_blank = end
+            end += 1
+        if end == start:
+            end = min(start + 1, n)
+        elif last_blank is not None and last_blank >= start + 1:
+            end = last_blank + 1
+        ranges.append([start + 1, end])
+        start = end
+    return ranges
+
+
+def synth_large_lines(kind, target_bytes, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    i = 0
+    while size < target_bytes:
+        if kind == "json":
+            line = f'  "key_{i}": {{"id": {i}, "label": "Eintrag {rng.random():.6f} – größer"}},'
+        else:
+            line = f"var a{i}=function(b){{return b.map(function(c){{return c*{i}}})}};"
+            if i % 50 == 0:
+                lines.append("")
+                size += 1
+            if i % 17 == 0:
+                line = f"export const chunk{i} = " + "x".join(
+                    "0123456789" for _ in range(8)
+                )
+        lines.append(line)
+        size += scan.utf8_len(line) + 1
+        i += 1
+    return lines
+
+
+SPLIT_WARMUP_BYTES = 512 * 1024
+SPLIT_WARMUP_RUNS = 3
+
+
+def bench_split(args):
+    print(f"\n📊 split_line_ranges on generated {args.kind} files\n")
+    warmup = synth_large_lines(args.kind, SPLIT_WARMUP_BYTES)
+    for _ in range(SPLIT_WARMUP_RUNS):
+        scan.split_line_ranges(warmup, "bench/large.js")
+    per_mb = []
+    for mb in args.sizes:
+        lines = synth_large_lines(args.kind, int(mb * 1024 * 1024))
+        elapsed, ranges = best_of(
+            lambda ls: scan.split_line_ranges(ls, "bench/large.js"), lines, args.repeat
+        )
+        per_mb.append(elapsed / mb)
+        row = f" - {mb:6.1f} MB  {elapsed * 1000:9.1f} ms  {mb / elapsed:8.1f} MB/s  {len(ranges)} blocks"
+        if mb <= args.legacy_max_mb:
+            legacy_t, _ = best_of(
+                lambda ls: legacy_split_line_ranges(ls, "bench/large.js"), lines, 1
+            )
+            row += f"  (legacy {legacy_t * 1000:.0f} ms, {legacy_t / elapsed:.0f}x)"
+        print(row)
+    ratio = max(per_mb) / min(per_mb)
+    print(f"\n📈 Time per MB varies by {ratio:.2f}x across sizes")
+    if ratio > args.max_ratio:
+        print(f"❌ Splitter no longer scales linearly (limit {args.max_ratio:.2f}x)")
+        sys.exit(1)
+    print("✅ Linear scaling confirmed\n")
+
+
+def write_synth_tree(root, files, seed=0):
+    rng = random.Random(seed)
+    for i in range(files):
+        rel_dir = os.path.join("components", f"group{i % 50}")
+        os.makedirs(os.path.join(root, rel_dir), exist_ok=True)
+        with open(
+            os.path.join(root, rel_dir, f"Widget{i}.tsx"), "w", encoding="utf-8"
+        ) as f:
+            f.write(synth_tsx_module(rng, i))
+
+
+@contextlib.contextmanager
+def scanner_rooted_at(src_dir):
+    saved = (scan.SRC_DIR, scan.CACHE_DIR, scan.OUTPUT_DIR)
+    with tempfile.TemporaryDirectory() as scratch:
+        scan.SRC_DIR = src_dir
+        scan.CACHE_DIR = os.path.join(scratch, "cache")
+        scan.OUTPUT_DIR = scratch
+        scan.SNAPSHOTS.clear()
+        try:
+            yield scratch
+        finally:
+            scan.SRC_DIR, scan.CACHE_DIR, scan.OUTPUT_DIR = saved
+            scan.SNAPSHOTS.clear()
+            scan.SNAPSHOT_CACHE.update(entries=None, dirty=False)
+            scan.CONTENT_CACHE.update(entries=None, dirty=False)
+            scan.TOKEN_CACHE.update(hashes=None, dirty=False)
+
+
+def drop_page_cache():
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def bench_read(args):
+    with contextlib.ExitStack() as stack:
+        src_dir = args.tree
+        if not src_dir:
+            src_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            write_synth_tree(src_dir, args.files)
+        stack.enter_context(scanner_rooted_at(src_dir))
+        print(f"\n📊 collect_codebase_blocks over {src_dir}\n")
+        baseline = None
+        for workers in args.workers:
+            scan.SETTINGS["workers"] = workers
+            best = None
+            for _ in range(args.repeat):
+                scan.CONTENT_CACHE.update(entries={}, dirty=False)
+                if args.drop_caches:
+                    drop_page_cache()
+                t0 = time.perf_counter()
+                blocks = scan.collect_codebase_blocks()
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            baseline = baseline or best
+            print(
+                f"   {workers:3d} worker(s)  {best * 1000:9.1f} ms"
+                f"  {baseline / best:5.2f}x  {len(blocks)} blocks\n"
+            )
+
+
+def best_of(fn, arg, repeat):
+    best = None
+    result = None
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = fn(arg)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best, result
+
+
+def bench_imports(args):
+    text = synth_tsx(args.modules)
+    mb = scan.utf8_len(text) / (1024 * 1024)
+    print(f"\n📊 Import extraction on {mb:.2f} MB of synthetic TSX\n")
+    legacy_t, legacy_specs = best_of(legacy_parse_import_specs, text, args.repeat)
+    current_t, current_specs = best_of(scan.parse_import_specs, text, args.repeat)
+    for label, elapsed, specs in (
+        ("legacy 4x regex", legacy_t, legacy_specs),
+        ("single scan", current_t, current_specs),
+    ):
+        print(
+            f" - {label:<16} {elapsed * 1000:9.1f} ms  {mb / elapsed:8.1f} MB/s"
+            f"  {len(specs)} specifiers"
+        )
+    print(f"\n✅ Speedup: {legacy_t / current_t:.2f}x\n")
+
+
+SUITE_CONFIGS = {
+    "package.json": '{\n  "name": "synthetic",\n  "private": true,\n  "scripts": {"dev": "next dev"}\n}\n',
+    "tsconfig.json": '{\n  "compilerOptions": {"paths": {"@/*": ["./src/*"]}}\n}\n',
+    "next.config.js": "module.exports = { output: 'export' }\n",
+    ".eslintrc.json": '{\n  "extends": "next/core-web-vitals"\n}\n',
+    ".gitignore": "node_modules/\n.next/\nout/\n",
+}
+SUITE_MODES = ("tree", "codebase", "config", "trace", "find", "types")
+SUITE_HUB = "lib/types.ts"
+
+
+def suite_layout(files, seed=0):
+    rng = random.Random(seed)
+    routes = max(files // 10, 1)
+    libs = max(files * 3 // 10, 1)
+    components = max(files - routes - libs - 1, 1)
+    layout = [SUITE_HUB]
+    layout += [f"lib/mod{i // 100}/util{i}.ts" for i in range(libs)]
+    layout += [f"components/group{i // 50}/Widget{i}.tsx" for i in range(components)]
+    layout += [f"app/section{i // 100}/route{i}/page.tsx" for i in range(routes)]
+    return rng, layout
+
+
+def suite_module(rng, rel, lib_paths, component_paths):
+    imports = []
+    if rng.random() < 0.3:
+        imports.append(f"import type {{ Meta }} from '@/{SUITE_HUB[:-3]}'")
+    pool = lib_paths if rel.startswith("lib/") else component_paths or lib_paths
+    for dep in rng.sample(pool, min(len(pool), rng.randint(1, 6))):
+        name = os.path.splitext(os.path.basename(dep))[0]
+        imports.append(
+            f"import {{ {name} as dep{len(imports)} }} from '@/{os.path.splitext(dep)[0]}'"
+        )
+    name = os.path.splitext(os.path.basename(rel))[0]
+    body = [
+        f"export function {name}(items: string[]) {{",
+        "  const total = items.length",
+        "  return items.map((item, index) => `${item}:${index}/${total}`)",
+        "}",
+        "",
+        f"export const {name}Label = '{name.lower()}'",
+    ]
+    return "\n".join(imports + [""] + body) + "\n"
+
+
+def write_suite_tree(root, files, huge_mb, seed=0):
+    src = os.path.join(root, "src")
+    rng, layout = suite_layout(files, seed)
+    lib_paths = [p for p in layout if p.startswith("lib/mod")]
+    component_paths = []
+    for rel in layout:
+        abs_path = os.path.join(src, rel)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        with open(abs_path, "w", encoding="utf-8") as f:
+            if rel == SUITE_HUB:
+                f.write("export type Meta = { slug: string; title: string }\n")
+            else:
+                f.write(suite_module(rng, rel, lib_paths, component_paths[-200:]))
+        if rel.startswith("components/"):
+            component_paths.append(rel)
+    for i, mb in enumerate(huge_mb):
+        kind = "json" if i % 2 else "js"
+        path = os.path.join(src, "lib", "data", f"huge{i}.{kind}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(synth_large_lines(kind, int(mb * 1024 * 1024), seed + i)))
+    for name, text in SUITE_CONFIGS.items():
+        with open(os.path.join(root, name), "w", encoding="utf-8") as f:
+            f.write(text)
+    return len(layout) + len(huge_mb)
+
+
+def run_suite_mode(mode):
+    if mode == "tree":
+        scan.print_tree()
+    elif mode == "codebase":
+        scan.write_codebase_parts()
+    elif mode == "config":
+        scan.write_config_bundle()
+    elif mode == "trace":
+        scan.run_trace_command(SUITE_HUB)
+    elif mode == "find":
+        scan.write_found_by_basename("page.tsx")
+    elif mode == "types":
+        scan.write_type_bundle([".ts"])
+    scan.save_caches()
+
+
+def bench_suite_mode(args):
+    scan.PROJECT_ROOT = args.root
+    scan.SRC_DIR = os.path.join(args.root, "src")
+    scan.CACHE_DIR = args.cache
+    with tempfile.TemporaryDirectory() as out_dir:
+        scan.OUTPUT_DIR = out_dir
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            run_suite_mode(args.mode)
+            elapsed = time.perf_counter() - t0
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_rss_mb()}))
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def measure_suite_mode(root, cache, mode):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "suite-mode", mode, root, cache],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare_to_baseline(results, baseline_path, max_regression, min_delta):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = []
+    for size, modes in results["sizes"].items():
+        for mode, row in modes.items():
+            base = baseline.get("sizes", {}).get(size, {}).get(mode)
+            if not base:
+                continue
+            for key in ("cold_s", "warm_s"):
+                limit = max(base[key] * (1 + max_regression), base[key] + min_delta)
+                if row[key] > limit:
+                    failures.append(
+                        f"{size} files {mode} {key}: {row[key]:.3f}s"
+                        f" > {base[key]:.3f}s +{max_regression:.0%}"
+                        f" (and +{min_delta * 1000:.0f} ms)"
+                    )
+    return failures
+
+
+def measure_suite_repeats(root, mode, repeat):
+    cold = []
+    warm = []
+    for _ in range(max(1, repeat)):
+        with tempfile.TemporaryDirectory() as cache:
+            cold.append(measure_suite_mode(root, cache, mode))
+            warm.append(measure_suite_mode(root, cache, mode))
+    peaks = [run["peak_rss_mb"] for run in cold + warm if run["peak_rss_mb"]]
+    return {
+        "cold_s": min(run["seconds"] for run in cold),
+        "warm_s": min(run["seconds"] for run in warm),
+        "peak_rss_mb": max(peaks) if peaks else None,
+    }
+
+
+def bench_suite(args):
+    results = {"python": sys.version.split()[0], "sizes": {}}
+    for files in args.files:
+        with tempfile.TemporaryDirectory() as root:
+            t0 = time.perf_counter()
+            total = write_suite_tree(root, files, args.huge_mb)
+            print(
+                f"\n📊 {total} synthetic files (generated in"
+                f" {time.perf_counter() - t0:.1f}s)\n"
+            )
+            rows = {}
+            for mode in args.modes:
+                rows[mode] = row = measure_suite_repeats(root, mode, args.repeat)
+                row["files_per_s"] = total / max(row["cold_s"], 1e-9)
+                peak = row["peak_rss_mb"]
+                print(
+                    f" - {mode:<9} cold {row['cold_s'] * 1000:9.1f} ms"
+                    f"  warm {row['warm_s'] * 1000:9.1f} ms"
+                    f"  {row['files_per_s']:9.0f} files/s"
+                    + (f"  peak {peak:6.1f} MB" if peak is not None else "")
+                )
+            results["sizes"][str(files)] = rows
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+    if args.baseline:
+        failures = compare_to_baseline(
+            results, args.baseline, args.max_regression, args.min_delta
+        )
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            sys.exit(1)
+        print(
+            f"✅ No regression beyond {args.max_regression:.0%}"
+            f" and {args.min_delta * 1000:.0f} ms of the baseline"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for scan_codebase.py")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    p_imports = sub.add_parser("imports", help="import specifier extraction")
+    p_imports.add_argument("--modules", type=int, default=5000)
+    p_imports.add_argument("--repeat", type=int, default=5)
+    p_imports.set_defaults(func=bench_imports)
+    p_split = sub.add_parser("split", help="large file block splitting")
+    p_split.add_argument("--kind", choices=("js", "json"), default="js")
+    p_split.add_argument("--sizes", type=float, nargs="+", default=[1.0, 2.0, 4.0, 8.0])
+    p_split.add_argument("--repeat", type=int, default=5)
+    p_split.add_argument("--legacy-max-mb", type=float, default=1.0)
+    p_split.add_argument("--max-ratio", type=float, default=3.0)
+    p_split.set_defaults(func=bench_split)
+    p_read = sub.add_parser("read", help="threaded file reading")
+    p_read.add_argument("--tree", help="existing src directory to read instead")
+    p_read.add_argument("--files", type=int, default=2000)
+    p_read.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    p_read.add_argument("--repeat", type=int, default=3)
+    p_read.add_argument(
+        "--drop-caches",
+        action="store_true",
+        help="drop the Linux page cache before each run (needs root)",
+    )
+    p_read.set_defaults(func=bench_read)
+    p_suite = sub.add_parser("suite", help="all query modes on synthetic Next.js trees")
+    p_suite.add_argument("--files", type=int, nargs="+", default=[1000, 10000, 100000])
+    p_suite.add_argument(
+        "--modes", nargs="+", choices=SUITE_MODES, default=list(SUITE_MODES)
+    )
+    p_suite.add_argument(
+        "--huge-mb",
+        type=float,
+        nargs="*",
+        default=[2.0, 4.0, 8.0],
+        help="sizes of the generated huge files",
+    )
+    p_suite.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="cold/warm runs per mode, the best of each is kept",
+    )
+    p_suite.add_argument("--json", help="write the results to this file")
+    p_suite.add_argument("--baseline", help="results file to compare against")
+    p_suite.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="allowed slowdown against the baseline, e.g. 0.25 for 25%%",
+    )
+    p_suite.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.05,
+        help="slowdowns below this many seconds never count as a regression",
+    )
+    p_suite.set_defaults(func=bench_suite)
+    p_mode = sub.add_parser("suite-mode", help=argparse.SUPPRESS)
+    p_mode.add_argument("mode", choices=SUITE_MODES)
+    p_mode.add_argument("root")
+    p_mode.add_argument("cache")
+    p_mode.set_defaults(func=bench_suite_mode)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
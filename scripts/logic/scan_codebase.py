@@ -4,12 +4,30 @@ import fnmatch
 import hashlib
 import datetime
 import re
+import json
+import argparse
+import time
+import math
+import functools
+import threading
+import mmap
+import codecs
+from array import array
+import itertools
+import subprocess
+import glob
+import zipfile
+import cProfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 PROJECT_ROOT = os.path.dirname(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 )
 SRC_DIR = os.path.join(PROJECT_ROOT, "src")
 OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(OUTPUT_DIR, ".scan_cache")
+CACHE_VERSION = 9
 IGNORE_DIRS = {
     "node_modules",
     ".git",
@@ -68,10 +86,14 @@ CONFIG_PATH_PATTERNS = [
     ".gitlab-ci.yml",
     "azure-pipelines.yml",
 ]
+CONFIG_NAME_RE = re.compile("|".join(map(fnmatch.translate, CONFIG_NAME_PATTERNS)))
+CONFIG_PATH_RE = re.compile("|".join(map(fnmatch.translate, CONFIG_PATH_PATTERNS)))
 
 SOFT_LIMIT = 70 * 1024
 HARD_LIMIT = 80 * 1024
 BLOCK_SEP = "\n\n"
+SNIFF_BYTES = 8192
+MMAP_THRESHOLD = 1024 * 1024
 BINARY_EXTS = {
     ".png",
     ".jpg",
@@ -101,22 +123,527 @@ BINARY_EXTS = {
     ".wasm",
     ".webp",
 }
+PACK_MODES = ("greedy", "ordered", "ffd")
+ORDER_MODES = ("path", "topo", "cluster")
+CLUSTER_ROUNDS = 20
+SETTINGS = {
+    "pack": "greedy",
+    "workers": 1,
+    "tokens": 0,
+    "estimator": "pieces",
+    "dedupe": True,
+    "compact": False,
+    "direction": "reverse",
+    "depth": 0,
+    "format": "txt",
+    "order": "path",
+    "processes": os.cpu_count() or 1,
+    "tree": 2,
+}
 
 
 def utf8_len(s):
     return len(s.encode("utf-8"))
 
 
-def build_tree(path, prefix=""):
-    entries = sorted([e for e in os.listdir(path) if e not in IGNORE_DIRS])
+GITIGNORE_FILES = (".gitignore", os.path.join(".git", "info", "exclude"))
+IGNORE_ENGINES = {}
+
+
+def glob_to_regex(glob):
+    out = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif glob[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif glob[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif glob[i] == "[" and "]" in glob[i + 2 :]:
+            end = glob.index("]", i + 2)
+            body = glob[i + 1 : end]
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        else:
+            if glob[i] == "\\" and i + 1 < len(glob):
+                i += 1
+            out.append(re.escape(glob[i]))
+            i += 1
+    return "".join(out)
+
+
+def ignore_rule_regex(line):
+    line = line.rstrip("\n").rstrip("\r")
+    if not line.strip() or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate or line.startswith("\\"):
+        line = line[1:]
+    line = line.rstrip(" ")
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    prefix = "" if "/" in line else "(?:.*/)?"
+    suffix = "/" if dir_only else "/?"
+    return negate, f"{prefix}{glob_to_regex(line.lstrip('/'))}{suffix}"
+
+
+def compile_ignore_rules(rules):
+    groups = []
+    for negate, pattern in rules:
+        if groups and groups[-1][0] == negate:
+            groups[-1][1].append(pattern)
+        else:
+            groups.append((negate, [pattern]))
+    return [
+        (negate, re.compile("(?:" + "|".join(patterns) + r")\Z"))
+        for negate, patterns in groups
+    ]
+
+
+def ignore_files_signature():
+    signature = []
+    for name in GITIGNORE_FILES:
+        try:
+            signature.append(os.stat(os.path.join(PROJECT_ROOT, name)).st_mtime_ns)
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def get_ignore_engine(names):
+    signature = ignore_files_signature()
+    engine = IGNORE_ENGINES.get(names)
+    if engine is not None and engine["signature"] == signature:
+        return engine
+    rules = [(False, f"(?:.*/)?{re.escape(name)}/?") for name in sorted(names)]
+    for name in GITIGNORE_FILES:
+        try:
+            with open(os.path.join(PROJECT_ROOT, name), encoding="utf-8") as f:
+                lines = f.readlines()
+        except (OSError, UnicodeDecodeError):
+            continue
+        rules.extend(rule for rule in map(ignore_rule_regex, lines) if rule)
+    engine = {"signature": signature, "groups": compile_ignore_rules(rules)}
+    IGNORE_ENGINES[names] = engine
+    return engine
+
+
+def is_ignored(engine, path, is_dir):
+    if is_dir:
+        path += "/"
+    for negate, pattern in reversed(engine["groups"]):
+        if pattern.match(path):
+            return not negate
+    return False
+
+
+PROFILE_PHASES = (
+    "walk",
+    "read",
+    "split",
+    "parse",
+    "resolve",
+    "index",
+    "pack",
+    "write",
+    "cache",
+)
+PROFILE = {"enabled": False, "phases": {}, "started": None, "runs": []}
+PROFILE_LOCK = threading.Lock()
+PROFILE_STACK = threading.local()
+
+
+def phase_record(name):
+    return PROFILE["phases"].setdefault(
+        name, {"seconds": 0.0, "calls": 0, "files": 0, "bytes": 0}
+    )
+
+
+def enter_phase(name):
+    now = time.perf_counter()
+    stack = PROFILE_STACK.__dict__.setdefault("frames", [])
+    if stack:
+        parent, started = stack[-1]
+        with PROFILE_LOCK:
+            phase_record(parent)["seconds"] += now - started
+    stack.append((name, now))
+
+
+def exit_phase(calls=1):
+    now = time.perf_counter()
+    stack = PROFILE_STACK.frames
+    name, started = stack.pop()
+    with PROFILE_LOCK:
+        record = phase_record(name)
+        record["seconds"] += now - started
+        record["calls"] += calls
+    if stack:
+        stack[-1] = (stack[-1][0], now)
+
+
+def count_phase(name, files=0, nbytes=0):
+    if not PROFILE["enabled"]:
+        return
+    with PROFILE_LOCK:
+        record = phase_record(name)
+        record["files"] += files
+        record["bytes"] += nbytes
+
+
+def profiled(name):
+    def wrap(fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            if not PROFILE["enabled"]:
+                return fn(*args, **kwargs)
+            enter_phase(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                exit_phase()
+
+        return timed
+
+    return wrap
+
+
+def profiled_iter(name, items):
+    items = iter(items)
+    done = object()
+    calls = 1
+    while True:
+        enabled = PROFILE["enabled"]
+        if enabled:
+            enter_phase(name)
+        try:
+            item = next(items, done)
+        finally:
+            if enabled:
+                exit_phase(calls)
+                calls = 0
+        if item is done:
+            return
+        yield item
+
+
+def start_profile():
+    PROFILE.update(phases={}, started=time.perf_counter())
+
+
+def finish_profile(query):
+    wall = time.perf_counter() - PROFILE["started"]
+    phases = PROFILE["phases"]
+    measured = sum(r["seconds"] for r in phases.values())
+    print(f"\n⏱️ Profile for '{query}' — {wall * 1000:.1f} ms wall\n")
+    print(
+        f"   {'phase':<8} {'time':>10} {'share':>6} {'calls':>8} {'files':>7} {'bytes':>10}"
+    )
+    names = [n for n in PROFILE_PHASES if n in phases] + sorted(
+        n for n in phases if n not in PROFILE_PHASES
+    )
+    for name in names:
+        r = phases[name]
+        print(
+            f"   {name:<8} {r['seconds'] * 1000:8.1f}ms {r['seconds'] / max(wall, 1e-9):6.0%}"
+            f" {r['calls']:8d} {r['files']:7d} {r['bytes'] / 1024:8.0f}KB"
+        )
+    other = max(wall - measured, 0.0)
+    print(f"   {'other':<8} {other * 1000:8.1f}ms {other / max(wall, 1e-9):6.0%}")
+    PROFILE["runs"].append({"query": query, "wall_s": wall, "phases": phases})
+
+
+def save_profile_json(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"runs": PROFILE["runs"]}, f, indent=2)
+    print(f"\n✅ Profile written to {path}")
+
+
+SNAPSHOTS = {}
+SNAPSHOT_CACHE = {"entries": None, "dirty": False}
+TREE_MAX_ENTRIES = 20
+
+
+def join_rel(rel_dir, name):
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+
+def snapshot_abs(snap, rel):
+    return os.path.join(snap["root"], *rel.split("/")) if rel else snap["root"]
+
+
+def snapshot_rel(snap, abs_path):
+    rel = normalize_rel(os.path.relpath(abs_path, snap["root"]))
+    return "" if rel == "." else rel
+
+
+def drop_snapshot_dir(snap, rel_dir):
+    record = snap["dirs"].pop(rel_dir, None)
+    if record is None:
+        return
+    mark_snapshot_changed(snap)
+    for name in record["files"]:
+        snap["files"].pop(join_rel(rel_dir, name), None)
+    for name in record["dirs"]:
+        drop_snapshot_dir(snap, join_rel(rel_dir, name))
+
+
+def mark_snapshot_changed(snap):
+    snap["totals"] = None
+    snap["generation"] += 1
+    SNAPSHOT_CACHE["dirty"] = True
+
+
+def scan_snapshot_dir(snap, rel_dir, mtime_ns):
+    dirs = []
+    files = {}
+    engine = snap["engine"]
+    base = join_rel(snap["prefix"], rel_dir)
+    with os.scandir(snapshot_abs(snap, rel_dir)) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+                if is_ignored(engine, join_rel(base, entry.name), is_dir):
+                    continue
+                if is_dir:
+                    if not entry.is_symlink():
+                        dirs.append(entry.name)
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            files[entry.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    old = snap["dirs"].get(rel_dir)
+    if old is not None:
+        for name in old["files"]:
+            snap["files"].pop(join_rel(rel_dir, name), None)
+        for name in set(old["dirs"]) - set(dirs):
+            drop_snapshot_dir(snap, join_rel(rel_dir, name))
+    for name, info in files.items():
+        snap["files"][join_rel(rel_dir, name)] = info
+    count_phase("walk", len(files))
+    mark_snapshot_changed(snap)
+    snap["dirs"][rel_dir] = {
+        "mtime_ns": mtime_ns,
+        "dirs": sorted(dirs),
+        "files": sorted(files),
+        "bytes": sum(info["size"] for info in files.values()),
+    }
+
+
+@profiled("walk")
+def restat_snapshot(snap):
+    snap["restat"] = False
+    changed = set()
+    for rel_dir, record in snap["dirs"].items():
+        size = 0
+        for name in record["files"]:
+            rel = join_rel(rel_dir, name)
+            meta = snap["files"][rel]
+            try:
+                st = os.stat(snapshot_abs(snap, rel))
+            except OSError:
+                changed.add(rel)
+                size += meta["size"]
+                continue
+            if st.st_size != meta["size"] or st.st_mtime_ns != meta["mtime_ns"]:
+                meta = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                snap["files"][rel] = meta
+                changed.add(rel)
+            size += meta["size"]
+        if size != record["bytes"]:
+            record["bytes"] = size
+            mark_snapshot_changed(snap)
+    if changed:
+        mark_snapshot_changed(snap)
+    return changed
+
+
+@profiled("walk")
+def refresh_snapshot(snap):
+    rescanned = 0
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            mtime_ns = os.stat(snapshot_abs(snap, rel_dir)).st_mtime_ns
+        except OSError:
+            drop_snapshot_dir(snap, rel_dir)
+            continue
+        record = snap["dirs"].get(rel_dir)
+        if record is None or record["mtime_ns"] != mtime_ns:
+            try:
+                scan_snapshot_dir(snap, rel_dir, mtime_ns)
+            except OSError:
+                drop_snapshot_dir(snap, rel_dir)
+                continue
+            rescanned += 1
+        stack.extend(join_rel(rel_dir, d) for d in snap["dirs"][rel_dir]["dirs"])
+    return rescanned
+
+
+def snapshot_prefix(root):
+    rel = normalize_rel(os.path.relpath(root, PROJECT_ROOT))
+    if rel == "." or rel.startswith("../") or rel == "..":
+        return ""
+    return rel
+
+
+def snapshot_cache_key(root, ignore):
+    return f"{cache_key(root)}|{','.join(sorted(ignore))}"
+
+
+def get_snapshot_cache():
+    if SNAPSHOT_CACHE["entries"] is None:
+        SNAPSHOT_CACHE["entries"] = load_json_cache("snapshot.json").get(
+            "snapshots", {}
+        )
+    return SNAPSHOT_CACHE["entries"]
+
+
+def save_snapshot_cache():
+    if not SNAPSHOT_CACHE["dirty"]:
+        return
+    entries = get_snapshot_cache()
+    for snap in SNAPSHOTS.values():
+        entries[snapshot_cache_key(snap["root"], snap["ignore"])] = {
+            "signature": list(snap["engine"]["signature"]),
+            "dirs": snap["dirs"],
+            "files": snap["files"],
+        }
+    save_json_cache("snapshot.json", {"snapshots": entries})
+    SNAPSHOT_CACHE["dirty"] = False
+
+
+def build_snapshot(root, ignore):
+    engine = get_ignore_engine(ignore)
+    snap = {
+        "root": root,
+        "ignore": ignore,
+        "engine": engine,
+        "prefix": snapshot_prefix(root),
+        "dirs": {},
+        "files": {},
+        "totals": None,
+        "restat": False,
+        "generation": 0,
+    }
+    saved = get_snapshot_cache().get(snapshot_cache_key(root, ignore))
+    if saved is not None and saved["signature"] == list(engine["signature"]):
+        snap.update(dirs=saved["dirs"], files=saved["files"], restat=True)
+    refresh_snapshot(snap)
+    return snap
+
+
+def snapshot_totals(snap):
+    if snap["restat"]:
+        restat_snapshot(snap)
+    if snap["totals"] is None:
+        totals = {}
+        for rel_dir in sorted(snap["dirs"], key=lambda d: -d.count("/") - bool(d)):
+            record = snap["dirs"][rel_dir]
+            files = len(record["files"])
+            size = record["bytes"]
+            for d in record["dirs"]:
+                sub = totals.get(join_rel(rel_dir, d), (0, 0))
+                files += sub[0]
+                size += sub[1]
+            totals[rel_dir] = (files, size)
+        snap["totals"] = totals
+    return snap["totals"]
+
+
+def format_totals(totals):
+    files, size = totals
+    return f"({files} file{'s' if files != 1 else ''}, {size / 1024:.1f} KB)"
+
+
+def get_snapshot(root=None, ignore=None):
+    root = root or SRC_DIR
+    ignore = frozenset(IGNORE_DIRS if ignore is None else ignore)
+    key = (root, ignore)
+    snap = SNAPSHOTS.get(key)
+    if snap is None or snap["engine"] is not get_ignore_engine(ignore):
+        snap = SNAPSHOTS[key] = build_snapshot(root, ignore)
+    else:
+        refresh_snapshot(snap)
+    return snap
+
+
+def walk_snapshot(snap, rel_dir=""):
+    stack = [rel_dir]
+    while stack:
+        cur = stack.pop()
+        record = snap["dirs"].get(cur)
+        if record is None:
+            continue
+        yield cur, record["dirs"], record["files"]
+        stack.extend(join_rel(cur, d) for d in reversed(record["dirs"]))
+
+
+def iter_snapshot_files(snap, rel_dir=""):
+    for cur, _, files in walk_snapshot(snap, rel_dir):
+        for fname in files:
+            yield join_rel(cur, fname)
+
+
+def build_tree(path, prefix="", snap=None, depth=0):
+    snap = snap or get_snapshot()
+    rel_dir = snapshot_rel(snap, path)
+    record = snap["dirs"].get(rel_dir)
+    if record is None:
+        return []
+    totals = snapshot_totals(snap)
+    subdirs = set(record["dirs"])
+    entries = sorted(record["dirs"] + record["files"])
+    hidden = entries[TREE_MAX_ENTRIES:] if depth else []
+    if hidden:
+        entries = entries[:TREE_MAX_ENTRIES]
     tree_lines = []
     for index, entry in enumerate(entries):
-        full_path = os.path.join(path, entry)
-        connector = "└── " if index == len(entries) - 1 else "├── "
-        tree_lines.append(f"{prefix}{connector}{entry}")
-        if os.path.isdir(full_path):
-            extension = "    " if index == len(entries) - 1 else "│   "
-            tree_lines.extend(build_tree(full_path, prefix + extension))
+        last = index == len(entries) - 1 and not hidden
+        connector = "└── " if last else "├── "
+        if entry not in subdirs:
+            tree_lines.append(f"{prefix}{connector}{entry}")
+            continue
+        sub_rel = join_rel(rel_dir, entry)
+        files, size = totals.get(sub_rel, (0, 0))
+        collapsed = depth == 1 and (files or snap["dirs"].get(sub_rel, {}).get("dirs"))
+        label = f"{entry}/ {format_totals((files, size))}"
+        tree_lines.append(f"{prefix}{connector}{label}{' …' if collapsed else ''}")
+        if depth != 1:
+            extension = "    " if last else "│   "
+            tree_lines.extend(
+                build_tree(
+                    os.path.join(path, entry),
+                    prefix + extension,
+                    snap,
+                    max(depth - 1, 0),
+                )
+            )
+    if hidden:
+        files = size = 0
+        for entry in hidden:
+            sub_rel = join_rel(rel_dir, entry)
+            if entry in subdirs:
+                n, b = totals.get(sub_rel, (0, 0))
+            else:
+                n, b = 1, snap["files"][sub_rel]["size"]
+            files += n
+            size += b
+        tree_lines.append(
+            f"{prefix}└── … {len(hidden)} more {format_totals((files, size))}"
+        )
     return tree_lines
 
 
@@ -129,65 +656,66 @@ def resolve_path_query(base_path, q):
         return None
     if parts and parts[0].lower() == "src":
         parts = parts[1:]
-    candidate = os.path.join(base_path, *parts)
-    if os.path.isdir(candidate):
-        return candidate
+    snap = get_snapshot(base_path)
+    if "/".join(parts) in snap["dirs"]:
+        return os.path.join(base_path, *parts)
     return None
 
 
 def find_directory_by_name(base_path, target_name):
     if target_name == "src":
         return base_path
-    for root, dirs, _ in os.walk(base_path):
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
+    snap = get_snapshot(base_path)
+    for rel_dir, dirs, _ in walk_snapshot(snap):
         for d in dirs:
             if d == target_name:
-                return os.path.join(root, d)
+                return snapshot_abs(snap, join_rel(rel_dir, d))
     return None
 
 
 def collect_file_contents(path):
+    snap = get_snapshot()
     entries = []
-    for root, dirs, files in os.walk(path):
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-        for fname in sorted(files):
-            abs_path = os.path.join(root, fname)
-            rel_path = os.path.relpath(abs_path, SRC_DIR)
-            try:
-                with open(abs_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-            except Exception as e:
-                content = f"<< Error reading file: {e} >>"
-            entries.append(f"// --- {rel_path} ---\n{content.strip()}\n")
+    for rel_path in iter_snapshot_files(snap, snapshot_rel(snap, path)):
+        _, lines, _ = read_cached_lines(snapshot_abs(snap, rel_path))
+        content = "\n".join(lines)
+        entries.append(f"// --- {rel_path} ---\n{content.strip()}\n")
     return entries
 
 
 def collect_file_contents_by_types(base_path, extensions):
     exts = {e.lower() if e.startswith(".") else f".{e.lower()}" for e in extensions}
+    snap = get_snapshot(base_path)
     entries = []
-    for root, dirs, files in os.walk(base_path):
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-        for fname in sorted(files):
-            name_lower = fname.lower()
-            if any(name_lower.endswith(ext) for ext in exts):
-                abs_path = os.path.join(root, fname)
-                rel_path = os.path.relpath(abs_path, SRC_DIR)
-                try:
-                    with open(abs_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                except Exception as e:
-                    content = f"<< Error reading file: {e} >>"
-                entries.append(f"// --- {rel_path} ---\n{content.strip()}\n")
+    for rel_path in iter_snapshot_files(snap):
+        name_lower = rel_path.rsplit("/", 1)[-1].lower()
+        if any(name_lower.endswith(ext) for ext in exts):
+            _, lines, _ = read_cached_lines(snapshot_abs(snap, rel_path))
+            content = "\n".join(lines)
+            entries.append(f"// --- {rel_path} ---\n{content.strip()}\n")
     return entries
 
 
+ENTRY_HEADER_RE = re.compile(r"// --- (.+?) ---")
+
+
+@profiled("write")
 def write_output_file(data, label):
+    if SETTINGS["format"] != "txt":
+        blocks = []
+        for entry in data:
+            header = entry.split("\n", 1)[0]
+            m = ENTRY_HEADER_RE.match(header)
+            blocks.append(text_block_spec(m.group(1) if m else header, header, entry))
+        write_block_parts(blocks, label, show_headers=False)
+        return
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
     filename = f"{timestamp}-{label}.txt"
     output_path = os.path.join(OUTPUT_DIR, filename)
     with open(output_path, "w", encoding="utf-8") as f:
         for entry in data:
             f.write(entry + "\n\n")
+    count_phase("write", len(data), sum(len(entry) + 2 for entry in data))
     print(f"\n✅ Written {len(data)} files to {output_path}")
 
 
@@ -214,45 +742,25 @@ def is_env_example(name):
 
 def collect_config_files(project_root):
     entries = []
-    ignore_dirs_cfg = set(IGNORE_DIRS) | {"scripts", "public"}
-    for root, dirs, files in os.walk(project_root):
-        dirs[:] = [d for d in dirs if d not in ignore_dirs_cfg]
-        rel_root = os.path.relpath(root, project_root).replace("\\", "/")
-        for fname in sorted(files):
-            if fname in LOCKFILES:
-                continue
-            if fname.lower().startswith(".env") and not is_env_example(fname):
-                continue
-            rel_path = (
-                os.path.normpath(os.path.join(rel_root, fname))
-                .lstrip("./")
-                .replace("\\", "/")
-            )
-            name_match = any(
-                fnmatch.fnmatch(fname, pat) for pat in CONFIG_NAME_PATTERNS
-            )
-            path_match = any(
-                fnmatch.fnmatch(rel_path, pat) for pat in CONFIG_PATH_PATTERNS
-            )
-            if not (name_match or path_match):
-                continue
-            abs_path = os.path.join(root, fname)
-            try:
-                with open(abs_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-            except Exception as e:
-                content = f"<< Error reading file: {e} >>"
-            entries.append(f"// --- {rel_path} ---\n{content.strip()}\n")
+    snap = get_snapshot(project_root, set(IGNORE_DIRS) | {"scripts", "public"})
+    for rel_path in iter_snapshot_files(snap):
+        fname = rel_path.rsplit("/", 1)[-1]
+        if fname in LOCKFILES:
+            continue
+        if fname.lower().startswith(".env") and not is_env_example(fname):
+            continue
+        if not (CONFIG_NAME_RE.match(fname) or CONFIG_PATH_RE.match(rel_path)):
+            continue
+        _, lines, _ = read_cached_lines(snapshot_abs(snap, rel_path))
+        content = "\n".join(lines)
+        entries.append(f"// --- {rel_path} ---\n{content.strip()}\n")
     entries.sort(key=lambda s: s.split("\n", 1)[0].lower())
     return entries
 
 
 def is_binary_path(path):
-    lower = path.lower()
-    for ext in BINARY_EXTS:
-        if lower.endswith(ext):
-            return True
-    return False
+    dot = path.rfind(".")
+    return dot >= 0 and path[dot:].lower() in BINARY_EXTS
 
 
 def normalize_rel(rel_path):
@@ -260,127 +768,1211 @@ def normalize_rel(rel_path):
 
 
 def iter_src_files():
-    for root, dirs, files in os.walk(SRC_DIR):
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-        files_sorted = sorted(files)
-        for fname in files_sorted:
-            abs_path = os.path.join(root, fname)
-            rel_path = normalize_rel(os.path.relpath(abs_path, SRC_DIR))
-            yield rel_path, abs_path
+    snap = get_snapshot()
+    for rel_path in iter_snapshot_files(snap):
+        yield rel_path, snapshot_abs(snap, rel_path)
+
+
+def block_bytes(text):
+    return utf8_len(text + BLOCK_SEP)
+
+
+CONTENT_CACHE = {"entries": None, "dirty": False}
+
+
+def load_json_cache(name):
+    path = os.path.join(CACHE_DIR, name)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+        return {}
+    return data
+
+
+def save_json_cache(name, data):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(data, version=CACHE_VERSION), f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def get_content_cache():
+    if CONTENT_CACHE["entries"] is None:
+        CONTENT_CACHE["entries"] = load_json_cache("content.json").get("files", {})
+    return CONTENT_CACHE["entries"]
+
 
+def save_content_cache():
+    if not CONTENT_CACHE["dirty"]:
+        return
+    entries = get_content_cache()
+    src_prefix = cache_key(SRC_DIR) + "/"
+    src_files = get_snapshot()["files"]
+    for key in [k for k in entries if k.startswith(src_prefix)]:
+        if key[len(src_prefix) :] not in src_files:
+            del entries[key]
+    save_json_cache("content.json", {"files": entries})
+    CONTENT_CACHE["dirty"] = False
+
+
+def cache_key(abs_path):
+    root = PROJECT_ROOT + os.sep
+    if abs_path.startswith(root) and ".." not in abs_path:
+        return normalize_rel(abs_path[len(root) :])
+    return normalize_rel(os.path.relpath(abs_path, PROJECT_ROOT))
+
+
+LINE_BREAK_RE = re.compile(r"\r\n|\r|\n")
+MAPPED_LINE_RE = re.compile(rb"([^\r\n]*)(?:\r\n?|\n)|([^\r\n]+)")
 
-def read_text_lines(abs_path):
+
+def split_lines(text):
+    lines = LINE_BREAK_RE.split(text)
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def decode_lines(raw):
     try:
-        with open(abs_path, "r", encoding="utf-8") as f:
-            return f.read().splitlines(), None
-    except Exception as e:
+        return split_lines(str(raw, "utf-8")), None
+    except UnicodeDecodeError as e:
         return [f"<< Error reading file: {e} >>"], str(e)
 
 
-def block_bytes(text):
-    return utf8_len(text + BLOCK_SEP)
+def sniff_binary(prefix):
+    if b"\0" in prefix:
+        return True
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+def make_content_entry(raw, st, lines, err):
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "hash": hashlib.sha1(raw).hexdigest(),
+        "lines": len(lines),
+        "bytes": len(raw),
+        "text_bytes": max(sum(line_sizes(lines)) - 1, 0),
+        "err": err,
+        "binary": False,
+        "splits": {},
+    }
+
+
+def make_binary_entry(raw, st):
+    entry = make_content_entry(raw, st, [], "binary content")
+    entry["binary"] = True
+    return entry
+
+
+def cached_entry(abs_path, st):
+    entry = get_content_cache().get(cache_key(abs_path))
+    if (
+        entry is not None
+        and entry["size"] == st.st_size
+        and entry["mtime_ns"] == st.st_mtime_ns
+    ):
+        return entry
+    return None
+
+
+def store_entry(abs_path, entry):
+    get_content_cache()[cache_key(abs_path)] = entry
+    CONTENT_CACHE["dirty"] = True
 
 
-def split_large_file(lines, rel_path):
-    blocks = []
+@profiled("read")
+def read_cached_lines(abs_path):
+    try:
+        st = os.stat(abs_path)
+        with open(abs_path, "rb") as f:
+            raw = f.read()
+    except OSError as e:
+        return None, [f"<< Error reading file: {e} >>"], str(e)
+    count_phase("read", 1, len(raw))
+    note_read(len(raw))
+    entry = cached_entry(abs_path, st)
+    if entry is None and sniff_binary(raw[:SNIFF_BYTES]):
+        entry = make_binary_entry(raw, st)
+        store_entry(abs_path, entry)
+    if entry is not None and entry["binary"]:
+        return entry, [f"<< Binary file, {len(raw)} bytes >>"], entry["err"]
+    lines, err = decode_lines(raw)
+    if entry is None:
+        entry = make_content_entry(raw, st, lines, err)
+        store_entry(abs_path, entry)
+    return entry, lines, err
+
+
+def iter_mapped_lines(buf):
+    for m in MAPPED_LINE_RE.finditer(buf):
+        yield m.span(m.lastindex)
+
+
+def mapped_line_stats(buf):
+    sizes = []
+    marks = []
+    for start, end in iter_mapped_lines(buf):
+        sizes.append(end - start + 1)
+        marks.append(line_mark(buf, start, end, BLANK_BYTES_RE, DECLARATION_BYTES_RE))
+    return sizes, marks
+
+
+def mapped_line_counts(buf, chunk=MMAP_THRESHOLD):
+    crlf = 0
+    breaks = 0
+    for pos in range(0, len(buf), chunk):
+        part = buf[pos : pos + chunk]
+        crlf += part.count(b"\r\n")
+        breaks += part.count(b"\r") + part.count(b"\n")
+        if part.endswith(b"\r") and buf[pos + chunk : pos + chunk + 1] == b"\n":
+            crlf += 1
+    breaks -= crlf
+    lines = breaks + (1 if len(buf) and buf[-1:] not in b"\r\n" else 0)
+    text_bytes = len(buf) - breaks - crlf + lines - 1
+    return lines, max(text_bytes, 0)
+
+
+def validate_utf8(buf, chunk=MMAP_THRESHOLD):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for pos in range(0, len(buf), chunk):
+            decoder.decode(buf[pos : pos + chunk])
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        return str(e)
+    return None
+
+
+@profiled("read")
+def mapped_content_entry(abs_path, st):
+    count_phase("read", 1, st.st_size)
+    with open(abs_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buf:
+        if sniff_binary(buf[:SNIFF_BYTES]):
+            return make_binary_entry(buf, st)
+        err = validate_utf8(buf)
+        lines, text_bytes = mapped_line_counts(buf) if err is None else (1, 0)
+        return {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "hash": hashlib.sha1(buf).hexdigest(),
+            "lines": lines,
+            "bytes": len(buf),
+            "text_bytes": text_bytes,
+            "err": err,
+            "binary": False,
+            "splits": {},
+        }
+
+
+def file_entry(abs_path):
+    try:
+        st = os.stat(abs_path)
+    except OSError:
+        return None
+    entry = cached_entry(abs_path, st)
+    if entry is None and st.st_size >= MMAP_THRESHOLD:
+        try:
+            entry = mapped_content_entry(abs_path, st)
+        except (OSError, ValueError):
+            entry = None
+        else:
+            store_entry(abs_path, entry)
+    if entry is None:
+        entry, _, _ = read_cached_lines(abs_path)
+    return entry
+
+
+DECLARATION_START_RE = re.compile(
+    r"(?:export|function|class|interface|type|enum|const|let|var|async|"
+    r"describe|it|test|module\.exports|@)\b"
+)
+DECLARATION_BYTES_RE = re.compile(DECLARATION_START_RE.pattern.encode())
+BLANK_LINE_RE = re.compile(r"[ \t\f\v]*")
+BLANK_BYTES_RE = re.compile(rb"[ \t\f\v]*")
+LINE_PLAIN, LINE_BLANK, LINE_DECLARATION = 0, 1, 2
+
+
+def line_sizes(lines):
+    return [(len(line) if line.isascii() else utf8_len(line)) + 1 for line in lines]
+
+
+def line_mark(text, start, end, blank_re, declaration_re):
+    if blank_re.fullmatch(text, start, end):
+        return LINE_BLANK
+    if declaration_re.match(text, start, end):
+        return LINE_DECLARATION
+    return LINE_PLAIN
+
+
+def line_marks(lines):
+    return [
+        line_mark(line, 0, len(line), BLANK_LINE_RE, DECLARATION_START_RE)
+        for line in lines
+    ]
+
+
+@profiled("split")
+def split_line_ranges(lines, rel_path, sizes=None, budget=None, marks=None):
+    if sizes is None:
+        sizes = line_sizes(lines)
+    if marks is None:
+        marks = line_marks(lines)
+    n = len(sizes)
+    if budget is None:
+        budget = HARD_LIMIT - block_bytes(widest_split_tag(rel_path, n))
+    count_phase("split", 1, sum(sizes))
+    ranges = []
     start = 0
-    n = len(lines)
     while start < n:
-        header = f"// --- {rel_path} ---"
+        used = 0
         end = start
         last_blank = None
+        last_decl = None
         while end < n:
-            if (
-                block_bytes(header + "\n" + "\n".join(lines[start : end + 1]))
-                > HARD_LIMIT
-            ):
+            used += sizes[end]
+            if used > budget:
                 break
-            if not lines[end].strip():
+            if marks[end] == LINE_BLANK:
                 last_blank = end
+            elif end > start and marks[end] == LINE_DECLARATION:
+                last_decl = end
             end += 1
         if end == start:
-            end = min(start + 1, n)
-        elif last_blank is not None and last_blank >= start + 1:
-            end = last_blank + 1
-        blocks.append({"file": rel_path, "lines": (start + 1, end)})
+            end = start + 1
+        elif end < n:
+            if last_blank is not None and last_blank >= start + 1:
+                end = last_blank + 1
+            elif last_decl is not None:
+                end = last_decl
+        ranges.append([start + 1, end, sum(sizes[start:end])])
         start = end
-    total = len(blocks)
-    normalized = []
-    for i, b in enumerate(blocks, start=1):
-        a, e = b["lines"]
-        tag = f"// --- {rel_path} [part {i}/{total}, lines {a}–{e}] ---"
-        text = "\n".join([tag] + lines[a - 1 : e])
-        normalized.append(
-            {"file": rel_path, "header": tag, "text": text, "bytes": block_bytes(text)}
+    return ranges
+
+
+def widest_split_tag(rel_path, n):
+    return split_tag(rel_path, n, n, n, n)
+
+
+def split_tag(rel_path, index, total, first, last):
+    return f"// --- {rel_path} [part {index}/{total}, lines {first}–{last}] ---"
+
+
+TOKEN_PIECE_RE = re.compile(
+    r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d{1,3}|[^\x00-\x7f]|\s+|[^\w\s]{1,2}|_"
+)
+TOKEN_TYPE_FACTORS = {
+    ".md": 1.1,
+    ".mdx": 1.1,
+    ".json": 0.9,
+    ".css": 0.9,
+    ".svg": 0.8,
+}
+BYTES_PER_TOKEN = {
+    ".ts": 3.4,
+    ".tsx": 3.2,
+    ".js": 3.0,
+    ".jsx": 3.2,
+    ".mjs": 3.0,
+    ".cjs": 3.0,
+    ".json": 2.8,
+    ".css": 3.1,
+    ".md": 3.6,
+    ".mdx": 3.4,
+    ".svg": 2.6,
+}
+
+
+def estimate_tokens_pieces(text, ext):
+    pieces = TOKEN_PIECE_RE.findall(text)
+    count = len(pieces) - pieces.count(" ")
+    return math.ceil(count * TOKEN_TYPE_FACTORS.get(ext, 1.0))
+
+
+def estimate_tokens_ratio(text, ext):
+    return math.ceil(utf8_len(text) / BYTES_PER_TOKEN.get(ext, 3.0))
+
+
+TOKEN_ESTIMATORS = {
+    "pieces": estimate_tokens_pieces,
+    "ratio": estimate_tokens_ratio,
+}
+TOKEN_CACHE = {"hashes": None, "dirty": False}
+
+
+def get_token_cache():
+    if TOKEN_CACHE["hashes"] is None:
+        TOKEN_CACHE["hashes"] = load_json_cache("tokens.json").get("hashes", {})
+    return TOKEN_CACHE["hashes"]
+
+
+def save_token_cache():
+    if not TOKEN_CACHE["dirty"]:
+        return
+    live = {entry["hash"] for entry in get_content_cache().values()}
+    hashes = {h: v for h, v in get_token_cache().items() if h in live}
+    TOKEN_CACHE["hashes"] = hashes
+    save_json_cache("tokens.json", {"hashes": hashes})
+    TOKEN_CACHE["dirty"] = False
+
+
+def estimate_tokens(text, ext):
+    return TOKEN_ESTIMATORS[SETTINGS["estimator"]](text, ext)
+
+
+COMPACT_EXTS = {".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".css"}
+COMPACT_LITERALS = r"""'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"|`(?:[^`\\]|\\.)*`|\\."""
+JS_REGEX_BODY = r"[^/\\\n\[]*(?:(?:\\.|\[[^\]\\\n]*(?:\\.[^\]\\\n]*)*\])[^/\\\n\[]*)*/"
+COMPACT_CODE = (
+    rf"{COMPACT_LITERALS}|[\w$)\]](?<!\breturn)(?<!\btypeof)(?P<div>[ \t]*)/(?![/*])"
+    rf"|(?<![\w$)\]<])/(?![/*>]){JS_REGEX_BODY}"
+)
+COMPACT_JSX_TEXT = (
+    r"""(?<![=>-])>(?![=>])(?=(?P<text>[^<>{}'"`;\n]*))(?P=text)(?=[<{\n]|\Z)"""
+)
+COMPACT_COMMENT_RE = {
+    "js": re.compile(rf"(?P<keep>{COMPACT_CODE})|//[^\n]*|/\*(?P<block>.*?)\*/", re.S),
+    "jsx": re.compile(
+        rf"(?P<keep>{COMPACT_CODE}|{COMPACT_JSX_TEXT})"
+        r"|(?<![^\s;,(){}\[\]])//[^\n]*|/\*(?P<block>.*?)\*/",
+        re.S,
+    ),
+    "css": re.compile(rf"(?P<keep>{COMPACT_LITERALS})|/\*(?P<block>.*?)\*/", re.S),
+}
+COMPACT_KINDS = {".css": "css", ".jsx": "jsx", ".tsx": "jsx"}
+COMPACT_SPACE_RE = re.compile(
+    rf"(?P<keep>{COMPACT_CODE})|(?P<newline>[ \t]*(?:\n[ \t]*)+)|[ \t]+", re.S
+)
+
+
+def is_compactable(rel_path):
+    return os.path.splitext(rel_path)[1].lower() in COMPACT_EXTS
+
+
+def drop_comment(m):
+    if m.group("keep") is not None:
+        return m.group("keep")
+    if m.group("block") is not None and "\n" in m.group("block"):
+        return "\n"
+    return " " if m.group("block") is not None else ""
+
+
+def collapse_space(m):
+    if m.group("div"):
+        return m.group("keep").replace(m.group("div"), " ")
+    if m.group("keep") is not None:
+        return m.group("keep")
+    return "\n" if m.group("newline") is not None else " "
+
+
+def compact_lines(lines, rel_path):
+    kind = COMPACT_KINDS.get(os.path.splitext(rel_path)[1].lower(), "js")
+    text = COMPACT_COMMENT_RE[kind].sub(drop_comment, "\n".join(lines))
+    text = COMPACT_SPACE_RE.sub(collapse_space, text).strip()
+    return split_lines(text)
+
+
+def source_lines(abs_path, rel_path, compact):
+    _, lines, _ = read_cached_lines(abs_path)
+    return compact_lines(lines, rel_path) if compact else lines
+
+
+def content_view(rel_path, abs_path, entry):
+    if not (SETTINGS["compact"] and is_compactable(rel_path)):
+        return dict(entry, compact=False)
+    info = entry.get("compact")
+    if info is None:
+        lines = source_lines(abs_path, rel_path, True)
+        info = entry["compact"] = {
+            "lines": len(lines),
+            "text_bytes": max(sum(line_sizes(lines)) - 1, 0),
+            "splits": {},
+        }
+        CONTENT_CACHE["dirty"] = True
+    return dict(info, hash=entry["hash"], compact=True, raw_bytes=entry["text_bytes"])
+
+
+def whole_file_spec(rel_path, abs_path, view, header):
+    spec = {
+        "file": rel_path,
+        "header": header,
+        "bytes": block_bytes(header) + (1 + view["text_bytes"] if view["lines"] else 0),
+        "abs_path": abs_path,
+        "lines": None,
+        "hash": view["hash"],
+        "compact": view["compact"],
+    }
+    if view["compact"]:
+        spec["compacted"] = (view["raw_bytes"], view["text_bytes"])
+    return spec
+
+
+def range_spec(rel_path, abs_path, view, tag, a, e, body_bytes):
+    spec = {
+        "file": rel_path,
+        "header": tag,
+        "bytes": block_bytes(tag) + body_bytes,
+        "abs_path": abs_path,
+        "lines": (a, e),
+        "hash": view["hash"],
+        "compact": view["compact"],
+        "mapped": is_mapped_view(view),
+    }
+    if view["compact"] and a == 1:
+        spec["compacted"] = (view["raw_bytes"], view["text_bytes"])
+    return spec
+
+
+def token_block_specs(rel_path, abs_path, view, header):
+    ext = os.path.splitext(rel_path)[1].lower()
+    budget = SETTINGS["tokens"]
+    sep_tokens = estimate_tokens(BLOCK_SEP, ext)
+    header_tokens = estimate_tokens(header + "\n", ext) + sep_tokens
+    tag_tokens = (
+        estimate_tokens(widest_split_tag(rel_path, view["lines"]) + "\n", ext)
+        + sep_tokens
+    )
+    key = f"{SETTINGS['estimator']}:{budget}:{tag_tokens}"
+    if view["compact"]:
+        key += ":compact"
+    per_hash = get_token_cache().setdefault(view["hash"], {})
+    info = per_hash.get(key)
+    if info is None:
+        lines = source_lines(abs_path, rel_path, view["compact"])
+        weights = [estimate_tokens(line + "\n", ext) for line in lines]
+        total = sum(weights)
+        ranges = None
+        if header_tokens + total > budget:
+            sizes = line_sizes(lines)
+            ranges = split_line_ranges(lines, rel_path, weights, budget - tag_tokens)
+            for r in ranges:
+                r.append(sum(sizes[r[0] - 1 : r[1]]))
+        info = per_hash[key] = {"tokens": total, "ranges": ranges}
+        TOKEN_CACHE["dirty"] = True
+    if info["ranges"] is None:
+        spec = whole_file_spec(rel_path, abs_path, view, header)
+        spec["tokens"] = header_tokens + info["tokens"]
+        return [spec]
+    total = len(info["ranges"])
+    specs = []
+    for i, (a, e, body_tokens, body_bytes) in enumerate(info["ranges"], start=1):
+        tag = split_tag(rel_path, i, total, a, e)
+        spec = range_spec(rel_path, abs_path, view, tag, a, e, body_bytes)
+        spec["tokens"] = estimate_tokens(tag + "\n", ext) + sep_tokens + body_tokens
+        specs.append(spec)
+    return specs
+
+
+def text_block_spec(rel_path, header, text):
+    ext = os.path.splitext(rel_path)[1].lower()
+    return {
+        "file": rel_path,
+        "header": header,
+        "text": text,
+        "bytes": block_bytes(text),
+        "tokens": estimate_tokens(text + BLOCK_SEP, ext),
+    }
+
+
+def file_block_specs(rel_path, abs_path):
+    header = f"// --- {rel_path} ---"
+    entry = file_entry(abs_path)
+    if entry is not None and entry["binary"]:
+        return []
+    if entry is None or entry["err"]:
+        if entry is None:
+            _, lines, _ = read_cached_lines(abs_path)
+        else:
+            lines = [f"<< Error reading file: {entry['err']} >>"]
+        return [text_block_spec(rel_path, header, "\n".join([header, lines[0]]))]
+    view = content_view(rel_path, abs_path, entry)
+    if SETTINGS["tokens"]:
+        return token_block_specs(rel_path, abs_path, view, header)
+    spec = whole_file_spec(rel_path, abs_path, view, header)
+    if spec["bytes"] <= HARD_LIMIT:
+        return [spec]
+    split_key = str(HARD_LIMIT)
+    ranges = view["splits"].get(split_key)
+    if ranges is None:
+        if is_mapped_view(view):
+            with map_file(abs_path) as buf:
+                sizes, marks = mapped_line_stats(buf)
+            ranges = split_line_ranges(None, rel_path, sizes, marks=marks)
+        else:
+            lines = source_lines(abs_path, rel_path, view["compact"])
+            ranges = split_line_ranges(lines, rel_path)
+        view["splits"][split_key] = ranges
+        CONTENT_CACHE["dirty"] = True
+    total = len(ranges)
+    return [
+        range_spec(
+            rel_path, abs_path, view, split_tag(rel_path, i, total, a, e), a, e, body
         )
-    return normalized
+        for i, (a, e, body) in enumerate(ranges, start=1)
+    ]
+
+
+PREFETCH_PARTS = 1
+
+
+def is_mapped_view(view):
+    return not view["compact"] and view["bytes"] >= MMAP_THRESHOLD
+
+
+def map_file(abs_path):
+    with open(abs_path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def block_source_key(block):
+    mapped = block["lines"] is not None and bool(block.get("mapped"))
+    return block["abs_path"], block["file"], block["compact"], mapped
+
+
+def load_block_source(key):
+    abs_path, rel_path, compact, mapped = key
+    if not mapped:
+        return source_lines(abs_path, rel_path, compact)
+    starts = array("q")
+    ends = array("q")
+    with map_file(abs_path) as buf:
+        note_read(len(buf))
+        for start, end in iter_mapped_lines(buf):
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def block_text(block, source):
+    a, e = block["lines"] or (1, None)
+    if not block_source_key(block)[3]:
+        return "\n".join([block["header"]] + source[a - 1 : e])
+    starts, ends = source
+    with map_file(block["abs_path"]) as buf:
+        raw = str(buf[starts[a - 1] : ends[e - 1]], "utf-8")
+    return block["header"] + "\n" + LINE_BREAK_RE.sub("\n", raw)
+
+
+def submit_part_sources(pool, part, sources):
+    for b in part:
+        if "text" not in b:
+            key = block_source_key(b)
+            if key not in sources:
+                sources[key] = pool.submit(load_block_source, key)
+
+
+def part_texts(part, sources):
+    return [
+        (
+            b["text"]
+            if "text" in b
+            else block_text(b, sources[block_source_key(b)].result())
+        )
+        for b in part
+    ]
+
+
+def iter_loaded_parts(numbered_parts):
+    sources = {}
+    window = deque()
+
+    def take():
+        part_idx, part = window.popleft()
+        texts = part_texts(part, sources)
+        keep = {block_source_key(b) for _, p in window for b in p if "text" not in b}
+        for key in [key for key in sources if key not in keep]:
+            del sources[key]
+        return part_idx, part, texts
+
+    with ThreadPoolExecutor(max_workers=max(1, SETTINGS["workers"])) as pool:
+        for part_idx, part in numbered_parts:
+            submit_part_sources(pool, part, sources)
+            window.append((part_idx, part))
+            if len(window) > PREFETCH_PARTS:
+                yield take()
+        while window:
+            yield take()
+
+
+READ_STATS = {"last": None, "files": 0, "bytes": 0, "t0": None}
+READ_LOCK = threading.Lock()
+
+
+def reset_read_stats():
+    with READ_LOCK:
+        READ_STATS.update(files=0, bytes=0, t0=time.perf_counter())
+
+
+def note_read(nbytes):
+    with READ_LOCK:
+        READ_STATS["files"] += 1
+        READ_STATS["bytes"] += nbytes
+
+
+def report_read_throughput():
+    with READ_LOCK:
+        files, total_bytes, t0 = (
+            READ_STATS["files"],
+            READ_STATS["bytes"],
+            READ_STATS["t0"],
+        )
+        READ_STATS.update(files=0, bytes=0, t0=None)
+    if not files or t0 is None:
+        return
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    rate = files / elapsed
+    line = (
+        f"📊 Read {files} file(s), {total_bytes / 1024:.0f} KB in {elapsed:.2f}s"
+        f" — {rate:.0f} files/s, {total_bytes / elapsed / (1024 * 1024):.1f} MB/s"
+        f" with {SETTINGS['workers']} worker(s)"
+    )
+    last = READ_STATS["last"]
+    if last:
+        line += f" ({(rate / last - 1) * 100:+.0f}% vs previous read)"
+    READ_STATS["last"] = rate
+    print(line)
+
+
+def iter_block_specs(items):
+    items = [(rel, abs_path) for rel, abs_path in items if not is_binary_path(rel)]
+    workers = max(1, min(SETTINGS["workers"], len(items)))
+    get_content_cache()
+    reset_read_stats()
+    if workers == 1:
+        for rel, abs_path in items:
+            yield from file_block_specs(rel, abs_path)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for specs in pool.map(lambda item: file_block_specs(*item), items):
+                yield from specs
+
+
+def read_blocks_parallel(items):
+    return list(iter_block_specs(items))
+
+
+def iter_codebase_blocks():
+    items = sorted(iter_src_files(), key=lambda item: item[0].lower())
+    if SETTINGS["order"] != "path":
+        rank = import_order_rank(SETTINGS["order"])
+        items.sort(key=lambda item: rank.get(item[0], len(rank)))
+    return iter_block_specs(items)
 
 
 def collect_codebase_blocks():
-    blocks = []
-    for rel_path, abs_path in iter_src_files():
-        if is_binary_path(rel_path):
+    return list(iter_codebase_blocks())
+
+
+def iter_next_fit(items, capacity, size):
+    current = []
+    used = 0
+    for item in items:
+        item_size = size(item)
+        if current and used + item_size > capacity:
+            yield current
+            current = []
+            used = 0
+        current.append(item)
+        used += item_size
+    if current:
+        yield current
+
+
+def next_fit(sizes, capacity):
+    return list(iter_next_fit(range(len(sizes)), capacity, sizes.__getitem__))
+
+
+def part_limits():
+    if SETTINGS["tokens"]:
+        return "tokens", SETTINGS["tokens"], SETTINGS["tokens"]
+    return "bytes", SOFT_LIMIT, HARD_LIMIT
+
+
+def pack_greedy(sizes, soft_limit):
+    return next_fit(sizes, soft_limit)
+
+
+def pack_ordered(sizes, hard_limit):
+    if not sizes:
+        return []
+    target = len(next_fit(sizes, hard_limit))
+    lo = max([s for s in sizes if s <= hard_limit] or [1])
+    hi = hard_limit
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if len(next_fit(sizes, mid)) <= target:
+            hi = mid
+        else:
+            lo = mid + 1
+    return next_fit(sizes, lo)
+
+
+def pack_first_fit_decreasing(sizes, hard_limit):
+    parts = []
+    free = []
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i], i)):
+        for p, room in enumerate(free):
+            if sizes[i] <= room:
+                parts[p].append(i)
+                free[p] -= sizes[i]
+                break
+        else:
+            parts.append([i])
+            free.append(hard_limit - sizes[i])
+    for part in parts:
+        part.sort()
+    parts.sort(key=lambda part: part[0])
+    return parts
+
+
+@profiled("pack")
+def pack_blocks(blocks, mode=None):
+    mode = mode or SETTINGS["pack"]
+    unit, soft_limit, hard_limit = part_limits()
+    sizes = [b[unit] for b in blocks]
+    count_phase("pack", len(blocks))
+    if mode == "ordered":
+        groups = pack_ordered(sizes, hard_limit)
+    elif mode == "ffd":
+        groups = pack_first_fit_decreasing(sizes, hard_limit)
+    else:
+        groups = pack_greedy(sizes, soft_limit)
+    return [[blocks[i] for i in group] for group in groups]
+
+
+def iter_packed_parts(blocks, mode=None):
+    mode = mode or SETTINGS["pack"]
+    blocks = profiled_iter("read", blocks)
+    if mode == "greedy":
+        unit, soft_limit, _ = part_limits()
+
+        def size(block):
+            count_phase("pack", 1)
+            return block[unit]
+
+        return profiled_iter("pack", iter_next_fit(blocks, soft_limit, size))
+    return iter(pack_blocks(list(blocks), mode))
+
+
+def dedupe_blocks(blocks):
+    first_path = {}
+    stub = None
+    for b in blocks:
+        if stub is not None:
+            if stub["file"] == b["file"]:
+                stub["saved"] += b["bytes"]
+                continue
+            yield stub
+            stub = None
+        if b.get("hash") is None:
+            yield b
+            continue
+        original = first_path.setdefault(b["hash"], b["file"])
+        if original == b["file"]:
+            yield b
             continue
-        lines, err = read_text_lines(abs_path)
-        header = f"// --- {rel_path} ---"
-        full_text = (
-            "\n".join([header] + lines) if not err else "\n".join([header, lines[0]])
+        header = f"// --- {b['file']} --- (identical to {original})"
+        stub = text_block_spec(b["file"], header, header)
+        if b["lines"] is None and stub["bytes"] >= b["bytes"]:
+            stub = None
+            yield b
+            continue
+        stub["saved"] = b["bytes"] - stub["bytes"]
+    if stub is not None:
+        yield stub
+
+
+WATCH_INTERVAL = 0.5
+WATCH_DEBOUNCE = 0.3
+LAST_BUNDLE = {"bundle": None}
+
+
+def bundle_parts(blocks):
+    if SETTINGS["dedupe"]:
+        blocks = dedupe_blocks(blocks)
+    return iter_packed_parts(blocks)
+
+
+def part_path(bundle, part_idx):
+    name = (
+        f"{bundle['timestamp']}-{bundle['label']}.txt"
+        if part_idx == 1 and not bundle["numbered"]
+        else f"{bundle['timestamp']}-{bundle['label']}-part-{part_idx:03d}.txt"
+    )
+    return os.path.join(OUTPUT_DIR, name)
+
+
+def part_signature(part):
+    return hash(
+        tuple(
+            (b["file"], b["header"], b.get("hash"), b.get("lines"), b.get("text"))
+            for b in part
+        )
+    )
+
+
+@profiled("write")
+def write_part(out_path, part, texts):
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(BLOCK_SEP.join(texts))
+    count_phase("write", len(part), sum(b["bytes"] for b in part))
+
+
+OUTPUT_FORMATS = ("txt", "jsonl", "zip")
+
+
+def archive_paths(bundle):
+    base = os.path.join(OUTPUT_DIR, f"{bundle['timestamp']}-{bundle['label']}")
+    return f"{base}.{bundle['format']}", f"{base}.index.json"
+
+
+def archive_member(part_idx):
+    return f"part-{part_idx:03d}.txt"
+
+
+def index_entry(block, part_idx, offset, length, chunks):
+    chunk = chunks[block["file"]] = chunks.get(block["file"], 0) + 1
+    entry = {
+        "chunk": chunk,
+        "lines": list(block["lines"]) if block.get("lines") else None,
+        "part": part_idx,
+        "offset": offset,
+        "length": length,
+    }
+    if "saved" in block:
+        entry["duplicate"] = True
+    return entry
+
+
+@profiled("write")
+def write_archive(bundle, parts):
+    archive_path, index_path = archive_paths(bundle)
+    files = {}
+    chunks = {}
+    signatures = []
+    with open(archive_path, "wb") as raw:
+        zf = (
+            zipfile.ZipFile(raw, "w", zipfile.ZIP_DEFLATED)
+            if bundle["format"] == "zip"
+            else None
+        )
+        offset = 0
+        loaded = iter_loaded_parts(enumerate(parts, start=1))
+        for part_idx, part, texts in loaded:
+            out = zf.open(archive_member(part_idx), "w") if zf else raw
+            if zf:
+                offset = 0
+            for i, (b, text) in enumerate(zip(part, texts)):
+                if zf:
+                    data = (BLOCK_SEP if i else "").encode("utf-8")
+                    out.write(data)
+                    offset += len(data)
+                    data = text.encode("utf-8")
+                else:
+                    record = {
+                        "part": part_idx,
+                        "file": b["file"],
+                        "lines": list(b["lines"]) if b.get("lines") else None,
+                        "text": text,
+                    }
+                    data = (json.dumps(record, ensure_ascii=False) + "\n").encode(
+                        "utf-8"
+                    )
+                out.write(data)
+                files.setdefault(b["file"], []).append(
+                    index_entry(b, part_idx, offset, len(data), chunks)
+                )
+                offset += len(data)
+            if zf:
+                out.close()
+            count_phase("write", len(part), sum(b["bytes"] for b in part))
+            signatures.append(part_signature(part))
+        index = {
+            "label": bundle["label"],
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "format": bundle["format"],
+            "archive": os.path.basename(archive_path),
+            "parts": len(signatures),
+            "files": files,
+        }
+        if zf:
+            zf.writestr("index.json", json.dumps(index, indent=2, ensure_ascii=False))
+            zf.close()
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    return signatures
+
+
+def print_part_listing(part):
+    for b in part:
+        line = f" - {b['header'].splitlines()[0]}"
+        if "compacted" in b:
+            raw, out = b["compacted"]
+            line += f" ({raw / 1024:.1f} KB → {out / 1024:.1f} KB)"
+        print(line)
+
+
+def report_stubs(part, where):
+    stubs = [b["saved"] for b in part if "saved" in b]
+    if stubs:
+        print(
+            f"♻️ {len(stubs)} duplicate file(s) stubbed,"
+            f" {sum(stubs) / 1024:.1f} KB saved {where}"
         )
-        if block_bytes(full_text) <= HARD_LIMIT:
-            blocks.append(
-                {
-                    "file": rel_path,
-                    "header": header,
-                    "text": full_text,
-                    "bytes": block_bytes(full_text),
-                }
+
+
+def write_archive_bundle(bundle, blocks, show_headers):
+    parts = list(bundle_parts(blocks))
+    if show_headers:
+        for part in parts:
+            print_part_listing(part)
+    bundle["parts"] = write_archive(bundle, parts)
+    archive_path, index_path = archive_paths(bundle)
+    if parts:
+        print(f"✅ Wrote {archive_path} ({len(parts)} part(s))")
+        print(f"🗂️ Index: {index_path}")
+    report_stubs([b for part in parts for b in part], "in this archive")
+
+
+def write_block_parts(blocks, label, numbered=False, show_headers=True, rebuild=None):
+    bundle = {
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d_%H-%M"),
+        "label": label,
+        "numbered": numbered,
+        "format": SETTINGS["format"],
+        "rebuild": rebuild,
+        "parts": [],
+    }
+    if bundle["format"] != "txt":
+        write_archive_bundle(bundle, blocks, show_headers)
+    else:
+        parts = enumerate(bundle_parts(blocks), start=1)
+        for part_idx, part, texts in iter_loaded_parts(parts):
+            if show_headers:
+                print_part_listing(part)
+            out_path = part_path(bundle, part_idx)
+            write_part(out_path, part, texts)
+            print(f"✅ Wrote {out_path}")
+            report_stubs(part, "in this part")
+            bundle["parts"].append(part_signature(part))
+    report_read_throughput()
+    if rebuild is not None and bundle["parts"]:
+        LAST_BUNDLE["bundle"] = bundle
+    return len(bundle["parts"])
+
+
+def rewrite_archive(bundle):
+    parts = list(bundle_parts(bundle["rebuild"]()))
+    signatures = [part_signature(part) for part in parts]
+    archive_path = archive_paths(bundle)[0]
+    if signatures == bundle["parts"] and os.path.exists(archive_path):
+        return 0, len(parts)
+    bundle["parts"] = write_archive(bundle, parts)
+    print(f" - rewrote {os.path.basename(archive_path)}")
+    report_read_throughput()
+    return len(parts), len(parts)
+
+
+def iter_stale_parts(bundle, signatures):
+    old = bundle["parts"]
+    for part_idx, part in enumerate(bundle_parts(bundle["rebuild"]()), start=1):
+        signature = part_signature(part)
+        signatures.append(signature)
+        if part_idx <= len(old) and old[part_idx - 1] == signature:
+            if os.path.exists(part_path(bundle, part_idx)):
+                continue
+        yield part_idx, part
+
+
+def rewrite_bundle(bundle):
+    if bundle["format"] != "txt":
+        return rewrite_archive(bundle)
+    old = bundle["parts"]
+    new = []
+    rewritten = 0
+    for part_idx, part, texts in iter_loaded_parts(iter_stale_parts(bundle, new)):
+        out_path = part_path(bundle, part_idx)
+        write_part(out_path, part, texts)
+        print(f" - rewrote {os.path.basename(out_path)}")
+        rewritten += 1
+    report_read_throughput()
+    for part_idx in range(len(new) + 1, len(old) + 1):
+        out_path = part_path(bundle, part_idx)
+        if os.path.exists(out_path):
+            os.remove(out_path)
+            print(f" - removed {os.path.basename(out_path)}")
+    bundle["parts"] = new
+    return rewritten, len(new)
+
+
+def poll_snapshot_changes(snap):
+    before = set(snap["files"])
+    refresh_snapshot(snap)
+    changed = before.symmetric_difference(snap["files"])
+    return changed | restat_snapshot(snap)
+
+
+def run_watch():
+    bundle = LAST_BUNDLE["bundle"]
+    if bundle is None:
+        print("⚠️ Write a codebase, trace, files, find or grep bundle first.")
+        return
+    snap = get_snapshot()
+    restat_snapshot(snap)
+    print(f"\n👀 Watching src/ for '{bundle['label']}' (Ctrl+C to stop)\n")
+    try:
+        while True:
+            changed = poll_snapshot_changes(snap)
+            if not changed:
+                time.sleep(WATCH_INTERVAL)
+                continue
+            while True:
+                time.sleep(WATCH_DEBOUNCE)
+                more = poll_snapshot_changes(snap)
+                if not more:
+                    break
+                changed |= more
+            t0 = time.perf_counter()
+            rewritten, total = rewrite_bundle(bundle)
+            save_caches()
+            elapsed = (time.perf_counter() - t0) * 1000
+            print(
+                f"🔄 {len(changed)} file(s) changed, rewrote {rewritten} of {total}"
+                f" part(s) in {elapsed:.0f} ms"
             )
-        else:
-            blocks.extend(split_large_file(lines, rel_path))
-    blocks.sort(key=lambda b: b["file"].lower())
-    return blocks
+    except KeyboardInterrupt:
+        print("\n👋 Watch stopped.")
+
+
+def codebase_manifest():
+    files = {}
+    for rel, abs_path in iter_src_files():
+        if is_binary_path(rel):
+            continue
+        entry = file_entry(abs_path)
+        if entry is not None and entry["binary"]:
+            continue
+        files[rel] = entry["hash"] if entry else None
+    return files
+
+
+def save_manifest(files):
+    save_json_cache(
+        "manifest.json",
+        {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "files": files,
+        },
+    )
 
 
 def write_codebase_parts():
-    blocks = collect_codebase_blocks()
-    if not blocks:
+    print("\n📄 Scanning entire src as codebase...\n")
+    written = write_block_parts(
+        iter_codebase_blocks(), "codebase", numbered=True, rebuild=iter_codebase_blocks
+    )
+    if not written:
         print("⚠️ No files in src.")
         return
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
-    part_idx = 1
-    current_payloads = []
-    current_headers = []
-    current_bytes = 0
-    written = 0
-
-    def flush_part():
-        nonlocal current_payloads, current_headers, current_bytes, part_idx, written
-        if not current_payloads:
-            return
-        payload = BLOCK_SEP.join(current_payloads)
-        part_name = f"{timestamp}-codebase-part-{part_idx:03d}.txt"
-        out_path = os.path.join(OUTPUT_DIR, part_name)
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(payload)
-        print(f"✅ Wrote {out_path}")
-        part_idx += 1
-        written += 1
-        current_payloads.clear()
-        current_headers.clear()
-        current_bytes = 0
+    save_manifest(codebase_manifest())
+    print(f"\n✅ Codebase written in {written} part(s)\n")
+
+
+def diff_manifests(old, new):
+    added = [rel for rel in new if rel not in old]
+    modified = [rel for rel in new if rel in old and old[rel] != new[rel]]
+    deleted = [rel for rel in old if rel not in new]
+    return added, modified, deleted
+
+
+def run_git(args):
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=SRC_DIR, capture_output=True, text=True
+        )
+    except OSError as e:
+        raise ValueError(f"git is not available: {e}")
+    if result.returncode != 0:
+        raise ValueError(result.stderr.strip() or f"git {args[0]} failed")
+    return [p for p in result.stdout.split("\0") if p]
 
-    print("\n📄 Scanning entire src as codebase...\n")
-    for b in blocks:
-        if current_bytes and current_bytes + b["bytes"] > SOFT_LIMIT:
-            flush_part()
-        if current_bytes + b["bytes"] > HARD_LIMIT:
-            flush_part()
-        current_payloads.append(b["text"])
-        current_headers.append(b["header"])
-        current_bytes += b["bytes"]
-        print(f" - {b['header'].splitlines()[0]}")
-    flush_part()
-    print(f"\n✅ Codebase written in {written} part(s)\n")
+
+def git_changes_since(rev, current):
+    fields = run_git(
+        ["diff", "--name-status", "--no-renames", "--relative", "-z", rev, "--"]
+    )
+    added, modified, deleted = [], [], []
+    for status, rel in zip(fields[::2], fields[1::2]):
+        if status == "D":
+            if not is_binary_path(rel):
+                deleted.append(rel)
+        elif rel in current:
+            (added if status == "A" else modified).append(rel)
+    untracked = run_git(["ls-files", "--others", "--exclude-standard", "-z"])
+    added.extend(rel for rel in untracked if rel in current)
+    return added, modified, deleted
+
+
+def delta_summary_block(since, added, modified, deleted):
+    header = f"// --- delta since {since} ---"
+    lines = [header]
+    for title, paths in (
+        ("added", added),
+        ("modified", modified),
+        ("deleted", deleted),
+    ):
+        lines.append(f"{title} ({len(paths)}):")
+        lines.extend(f"  {rel}" for rel in paths)
+    return text_block_spec("", header, "\n".join(lines))
+
+
+def write_delta_parts(rev=None):
+    current = codebase_manifest()
+    if rev:
+        try:
+            added, modified, deleted = git_changes_since(rev, current)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        since = f"git {rev}"
+    else:
+        previous = load_json_cache("manifest.json")
+        if not previous:
+            print("⚠️ No previous manifest, every file counts as added.")
+        added, modified, deleted = diff_manifests(previous.get("files", {}), current)
+        since = previous.get("created", "nothing")
+    for paths in (added, modified, deleted):
+        paths.sort(key=str.lower)
+    print(
+        f"\n📄 Delta since {since}: {len(added)} added, {len(modified)} modified,"
+        f" {len(deleted)} deleted\n"
+    )
+    if not (added or modified or deleted):
+        print("✅ Nothing changed.")
+        if not rev:
+            save_manifest(current)
+        return
+    changed = sorted(added + modified, key=str.lower)
+    blocks = itertools.chain(
+        [delta_summary_block(since, added, modified, deleted)],
+        iter_block_specs((rel, os.path.join(SRC_DIR, rel)) for rel in changed),
+    )
+    written = write_block_parts(blocks, "delta", numbered=True)
+    if not rev:
+        save_manifest(current)
+    print(f"\n✅ Delta written in {written} part(s)\n")
 
 
 def tokenize_commalist(q):
@@ -404,13 +1996,8 @@ def tokenize_commalist(q):
     return tokens
 
 
-def list_all_src_paths():
-    paths = []
-    for root, dirs, files in os.walk(SRC_DIR):
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-        for f in files:
-            rel = normalize_rel(os.path.relpath(os.path.join(root, f), SRC_DIR))
-            paths.append(rel)
+def list_all_src_paths(snap=None):
+    paths = list((snap or get_snapshot())["files"])
     paths.sort(key=lambda p: p.lower())
     return paths
 
@@ -447,27 +2034,7 @@ def collect_selected_blocks(tokens):
                 notices.append(f"⚠️ {tok} -> {rel} ({err})")
         else:
             notices.append(f"⚠️ {err}")
-    blocks = []
-    for rel in ordered:
-        abs_path = os.path.join(SRC_DIR, rel)
-        if is_binary_path(rel):
-            continue
-        lines, err = read_text_lines(abs_path)
-        header = f"// --- {rel} ---"
-        full_text = (
-            "\n".join([header] + lines) if not err else "\n".join([header, lines[0]])
-        )
-        if block_bytes(full_text) <= HARD_LIMIT:
-            blocks.append(
-                {
-                    "file": rel,
-                    "header": header,
-                    "text": full_text,
-                    "bytes": block_bytes(full_text),
-                }
-            )
-        else:
-            blocks.extend(split_large_file(lines, rel))
+    blocks = read_blocks_parallel((rel, os.path.join(SRC_DIR, rel)) for rel in ordered)
     return blocks, notices
 
 
@@ -479,44 +2046,10 @@ def write_selected_files(tokens):
     if not blocks:
         print("⚠️ No matching files.")
         return
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
-    part_idx = 1
-    current_payloads = []
-    current_headers = []
-    current_bytes = 0
-    written = 0
-
-    def flush_part():
-        nonlocal current_payloads, current_headers, current_bytes, part_idx, written
-        if not current_payloads:
-            return
-        payload = BLOCK_SEP.join(current_payloads)
-        name = (
-            f"{timestamp}-files.txt"
-            if part_idx == 1 and written == 0
-            else f"{timestamp}-files-part-{part_idx:03d}.txt"
-        )
-        out_path = os.path.join(OUTPUT_DIR, name)
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(payload)
-        print(f"✅ Wrote {out_path}")
-        part_idx += 1
-        written += 1
-        current_payloads.clear()
-        current_headers.clear()
-        current_bytes = 0
-
     print("\n📄 Concatenating selected files...\n")
-    for b in blocks:
-        if current_bytes and current_bytes + b["bytes"] > SOFT_LIMIT:
-            flush_part()
-        if current_bytes + b["bytes"] > HARD_LIMIT:
-            flush_part()
-        current_payloads.append(b["text"])
-        current_headers.append(b["header"])
-        current_bytes += b["bytes"]
-        print(f" - {b['header'].splitlines()[0]}")
-    flush_part()
+    written = write_block_parts(
+        blocks, "files", rebuild=lambda: collect_selected_blocks(tokens)[0]
+    )
     print(f"\n✅ Files written in {written} part(s)\n")
 
 
@@ -536,40 +2069,13 @@ def is_single_basename_query(q):
 
 
 def find_paths_by_basename(basename):
-    matches = []
-    for root, dirs, files in os.walk(SRC_DIR):
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-        for f in files:
-            if f == basename:
-                rel = normalize_rel(os.path.relpath(os.path.join(root, f), SRC_DIR))
-                matches.append(rel)
+    matches = [p for p in get_snapshot()["files"] if p.rsplit("/", 1)[-1] == basename]
     matches.sort(key=lambda p: p.lower())
     return matches
 
 
 def collect_blocks_for_paths(paths):
-    blocks = []
-    for rel in paths:
-        abs_path = os.path.join(SRC_DIR, rel)
-        if is_binary_path(rel):
-            continue
-        lines, err = read_text_lines(abs_path)
-        header = f"// --- {rel} ---"
-        full_text = (
-            "\n".join([header] + lines) if not err else "\n".join([header, lines[0]])
-        )
-        if block_bytes(full_text) <= HARD_LIMIT:
-            blocks.append(
-                {
-                    "file": rel,
-                    "header": header,
-                    "text": full_text,
-                    "bytes": block_bytes(full_text),
-                }
-            )
-        else:
-            blocks.extend(split_large_file(lines, rel))
-    return blocks
+    return read_blocks_parallel((rel, os.path.join(SRC_DIR, rel)) for rel in paths)
 
 
 def write_found_by_basename(basename):
@@ -578,42 +2084,15 @@ def write_found_by_basename(basename):
         print(f"⚠️ No files named '{basename}' under src.")
         return
     blocks = collect_blocks_for_paths(paths)
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
-    part_idx = 1
-    current_payloads = []
-    current_bytes = 0
-    written = 0
-
-    def flush_part():
-        nonlocal current_payloads, current_bytes, part_idx, written
-        if not current_payloads:
-            return
-        payload = BLOCK_SEP.join(current_payloads)
-        name = (
-            f"{timestamp}-find-{basename}.txt"
-            if part_idx == 1 and written == 0
-            else f"{timestamp}-find-{basename}-part-{part_idx:03d}.txt"
-        )
-        out_path = os.path.join(OUTPUT_DIR, name)
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(payload)
-        print(f"✅ Wrote {out_path}")
-        part_idx += 1
-        written += 1
-        current_payloads.clear()
-        current_bytes = 0
-
     print(f"\n📄 Searching for '{basename}' under src ...\n")
     for rel in paths:
         print(f" - {rel}")
-    for b in blocks:
-        if current_bytes and current_bytes + b["bytes"] > SOFT_LIMIT:
-            flush_part()
-        if current_bytes + b["bytes"] > HARD_LIMIT:
-            flush_part()
-        current_payloads.append(b["text"])
-        current_bytes += b["bytes"]
-    flush_part()
+    write_block_parts(
+        blocks,
+        f"find-{basename}",
+        show_headers=False,
+        rebuild=lambda: collect_blocks_for_paths(find_paths_by_basename(basename)),
+    )
     print(f"\n✅ Found {len(paths)} file(s) for '{basename}'\n")
 
 
@@ -621,28 +2100,38 @@ EXT_CANDIDATES = [".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs"]
 
 
 def read_file_text(abs_path):
-    try:
-        with open(abs_path, "r", encoding="utf-8") as f:
-            return f.read()
-    except Exception:
+    entry, lines, err = read_cached_lines(abs_path)
+    if err:
         return ""
+    return "\n".join(lines)
+
+
+IMPORT_SCAN_RE = re.compile(
+    r"""
+        i(?<![\w$]i)mport(?:\s*\(\s*|\s*(?=['"])|\s+(?:[\w$*,\s]|\{[^}]*\})*?\bfrom\s*)
+        (['"`])([^'"`\n]+)\1
+      | e(?<![\w$]e)xport\s+(?:type\s+)?(?:\*(?:\s*as\s+[\w$]+)?|\{[^}]*\})\s*from\s*
+        (['"`])([^'"`\n]+)\3
+      | r(?<![\w$]r)equire\s*\(\s*(['"`])([^'"`\n]+)\5
+      | /(?:
+            /[^\n]*
+          | \*.*?(?:\*/|\Z)
+          | (?<![\w$)\]]/)(?=[^/\n])"""
+    + JS_REGEX_BODY
+    + r"""
+        )
+      | '[^'\\\n]*(?:\\.[^'\\\n]*)*'?
+      | "[^"\\\n]*(?:\\.[^"\\\n]*)*"?
+      | `[^`\\\n]*(?:(?:\\.|\n(?![ \t]*(?:import|export)\b))[^`\\\n]*)*`?
+    """,
+    re.S | re.X,
+)
 
 
+@profiled("parse")
 def parse_import_specs(text):
-    specs = []
-    for m in re.finditer(
-        r"(?m)^\s*import\s+[^'\"\n;]*\sfrom\s+['\"]([^'\"\n]+)['\"]", text
-    ):
-        specs.append(m.group(1))
-    for m in re.finditer(r"(?m)^\s*import\s+['\"]([^'\"\n]+)['\"]", text):
-        specs.append(m.group(1))
-    for m in re.finditer(
-        r"(?m)^\s*export\s+[^'\"\n;]*\sfrom\s+['\"]([^'\"\n]+)['\"]", text
-    ):
-        specs.append(m.group(1))
-    for m in re.finditer(r"require\(\s*['\"]([^'\"\n]+)['\"]\s*\)", text):
-        specs.append(m.group(1))
-    return specs
+    count_phase("parse", 1, len(text))
+    return [m.group(m.lastindex) for m in IMPORT_SCAN_RE.finditer(text) if m.lastindex]
 
 
 def resolve_import_to_rel(from_rel, spec, all_paths_set):
@@ -683,180 +2172,1487 @@ def try_resolve_with_exts(rel_path_candidate, all_paths_set):
     return None
 
 
+SYMBOL_IMPORT_RE = re.compile(
+    r"""^[ \t]*import\s+(?:type\s+)?(?P<clause>[\w$*{},\s]+?)\s*from\s*['"](?P<spec>[^'"\n]+)['"]""",
+    re.M,
+)
+SYMBOL_EXPORT_FROM_RE = re.compile(
+    r"""^[ \t]*export\s+(?:type\s+)?(?P<clause>\*(?:\s*as\s+[\w$]+)?|\{[^}]*\})\s*from\s*['"](?P<spec>[^'"\n]+)['"]""",
+    re.M,
+)
+SYMBOL_EXPORT_LIST_RE = re.compile(
+    r"^[ \t]*export\s+(?:type\s+)?\{(?P<clause>[^}]*)\}(?!\s*from\b)", re.M
+)
+SYMBOL_EXPORT_DECL_RE = re.compile(
+    r"^[ \t]*export\s+(?:declare\s+)?(?P<default>default\s+)?(?:async\s+)?"
+    r"(?:abstract\s+)?(?:const\s+enum|function\s*\*?|class|const|let|var|type|"
+    r"interface|enum|namespace)\s+(?P<name>[\w$]+)",
+    re.M,
+)
+SYMBOL_EXPORT_DEFAULT_RE = re.compile(
+    r"^[ \t]*export\s+default\s+(?:(?P<name>[\w$]+)\s*;?[ \t]*$)?", re.M
+)
+
+
+def parse_binding_list(clause):
+    pairs = []
+    for item in clause.split(","):
+        words = item.split()
+        if words[:1] == ["type"] and len(words) > 1:
+            words = words[1:]
+        if len(words) == 3 and words[1] == "as":
+            pairs.append((words[0], words[2]))
+        elif len(words) == 1:
+            pairs.append((words[0], words[0]))
+    return pairs
+
+
+def parse_import_clause(clause):
+    braces = re.search(r"\{([^}]*)\}", clause)
+    bindings = parse_binding_list(braces.group(1)) if braces else []
+    rest = clause[: braces.start()] + clause[braces.end() :] if braces else clause
+    for piece in rest.split(","):
+        words = piece.split()
+        if words[:2] == ["*", "as"] and len(words) == 3:
+            bindings.append(("*", words[2]))
+        elif len(words) == 1:
+            bindings.append(("default", words[0]))
+    return bindings
+
+
+@profiled("parse")
+def parse_symbols(text):
+    text = COMPACT_COMMENT_RE["js"].sub(drop_comment, text)
+    local_imports = {}
+    uses = []
+    for m in SYMBOL_IMPORT_RE.finditer(text):
+        for imported, local in parse_import_clause(m.group("clause")):
+            local_imports[local] = (m.group("spec"), imported)
+            uses.append([m.group("spec"), imported])
+    exports = []
+    reexports = []
+    for m in SYMBOL_EXPORT_FROM_RE.finditer(text):
+        clause = m.group("clause")
+        if clause == "*":
+            reexports.append([m.group("spec"), "*", "*"])
+        elif clause.startswith("*"):
+            name = clause.split()[-1]
+            exports.append([name, name])
+        else:
+            for orig, name in parse_binding_list(clause[1:-1]):
+                reexports.append([m.group("spec"), orig, name])
+    for m in SYMBOL_EXPORT_LIST_RE.finditer(text):
+        for local, name in parse_binding_list(m.group("clause")):
+            if local in local_imports:
+                spec, imported = local_imports[local]
+                reexports.append([spec, imported, name])
+            else:
+                exports.append([name, local])
+    for m in SYMBOL_EXPORT_DECL_RE.finditer(text):
+        exports.append(
+            ["default" if m.group("default") else m.group("name"), m.group("name")]
+        )
+    exported = [name for name, _ in exports] + [name for _, _, name in reexports]
+    if "default" not in exported:
+        for m in SYMBOL_EXPORT_DEFAULT_RE.finditer(text):
+            local = m.group("name") or "default"
+            if local in local_imports:
+                spec, imported = local_imports[local]
+                reexports.append([spec, imported, "default"])
+            else:
+                exports.append(["default", local])
+            break
+    return {"exports": exports, "reexports": reexports, "uses": uses}
+
+
+WORKSPACES = {"packages": None, "graph": None, "links": None}
+IMPORT_GRAPH = {
+    "files": None,
+    "signature": None,
+    "indexes": None,
+    "stamp": None,
+    "reach": None,
+    "traces": {},
+    "symbols": None,
+    "dirty": False,
+}
+
+
+def get_import_cache():
+    if IMPORT_GRAPH["files"] is None:
+        data = load_json_cache("imports.json")
+        IMPORT_GRAPH["files"] = data.get("files", {})
+        IMPORT_GRAPH["signature"] = data.get("signature")
+    return IMPORT_GRAPH["files"]
+
+
+def save_import_cache():
+    if not IMPORT_GRAPH["dirty"]:
+        return
+    save_json_cache(
+        "imports.json",
+        {"signature": IMPORT_GRAPH["signature"], "files": get_import_cache()},
+    )
+    IMPORT_GRAPH["dirty"] = False
+
+
+def file_import_record(rel, files):
+    abs_path = os.path.join(SRC_DIR, rel)
+    record = files.get(rel)
+    entry = file_entry(abs_path)
+    file_hash = entry["hash"] if entry else None
+    if record is not None and record["hash"] == file_hash and "symbols" in record:
+        return record, False
+    text = ""
+    if entry and not entry["err"]:
+        _, lines, _ = read_cached_lines(abs_path)
+        text = "\n".join(lines)
+    record = {
+        "hash": file_hash,
+        "specs": parse_import_specs(text),
+        "imports": None,
+        "symbols": parse_symbols(text),
+    }
+    files[rel] = record
+    return record, True
+
+
+@profiled("resolve")
+def resolve_record_imports(rel, record, all_set):
+    resolved = {resolve_import_to_rel(rel, spec, all_set) for spec in record["specs"]}
+    resolved.discard(None)
+    record["imports"] = sorted(resolved)
+    IMPORT_GRAPH["dirty"] = True
+    count_phase("resolve", 1)
+
+
+@profiled("index")
 def build_import_indexes():
-    all_paths = list_all_src_paths()
+    snap = get_snapshot()
+    stamp = IMPORT_GRAPH["stamp"]
+    if stamp is not None and stamp[0] is snap and stamp[1] == snap["generation"]:
+        return IMPORT_GRAPH["indexes"]
+    all_paths = list_all_src_paths(snap)
     all_set = set(all_paths)
+    signature = hashlib.sha1("\n".join(all_paths).encode("utf-8")).hexdigest()
+    files = get_import_cache()
+    same_paths = IMPORT_GRAPH["signature"] == signature
+    changed = 0
     imports = {p: set() for p in all_paths}
     for rel in all_paths:
         if is_binary_path(rel):
             continue
-        abs_path = os.path.join(SRC_DIR, rel)
-        txt = read_file_text(abs_path)
-        specs = parse_import_specs(txt)
-        for spec in specs:
-            resolved = resolve_import_to_rel(rel, spec, all_set)
-            if resolved:
-                imports[rel].add(resolved)
+        record, parsed = file_import_record(rel, files)
+        if parsed:
+            changed += 1
+        if record["imports"] is None or not same_paths:
+            resolve_record_imports(rel, record, all_set)
+        imports[rel].update(record["imports"])
+    for rel in [r for r in files if r not in all_set]:
+        del files[rel]
+        changed += 1
+    if changed or not same_paths:
+        IMPORT_GRAPH["dirty"] = True
+    IMPORT_GRAPH["stamp"] = (snap, snap["generation"])
+    cached = IMPORT_GRAPH["indexes"]
+    if cached is not None and same_paths and not changed:
+        return cached
+    IMPORT_GRAPH["signature"] = signature
     importers = {p: set() for p in all_paths}
     for a, outs in imports.items():
         for b in outs:
             importers[b].add(a)
-    return imports, importers, all_paths
-
-
-def trace_closure(start_rel, imports, importers):
-    seen = set()
-    queue = [start_rel]
-    ordered = []
+    IMPORT_GRAPH["indexes"] = (imports, importers, all_paths)
+    IMPORT_GRAPH["reach"] = None
+    IMPORT_GRAPH["traces"] = {}
+    IMPORT_GRAPH["symbols"] = None
+    return IMPORT_GRAPH["indexes"]
+
+
+TRACE_DIRECTIONS = ("reverse", "forward", "both")
+TRACE_MEMO_LIMIT = 256
+TRACE_FLAGS = {"-r": "reverse", "-f": "forward", "-b": "both"}
+
+
+def strongly_connected_components(imports):
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    comps = []
+    for root in sorted(imports, key=str.lower):
+        if root in index:
+            continue
+        work = [(root, iter(sorted(imports[root], key=str.lower)))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, edges = work[-1]
+            for nxt in edges:
+                if nxt not in index:
+                    index[nxt] = low[nxt] = len(index)
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(sorted(imports[nxt], key=str.lower))))
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    comp = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        comp.append(member)
+                        if member == node:
+                            break
+                    comps.append(sorted(comp, key=str.lower))
+    return comps
+
+
+def cycle_components(comps, imports):
+    return [comp for comp in comps if len(comp) > 1 or comp[0] in imports[comp[0]]]
+
+
+def build_reachability(imports):
+    comps = strongly_connected_components(imports)
+    return {"comps": comps, "cycles": cycle_components(comps, imports)}
+
+
+def get_reachability(indexes=None):
+    imports, _, _ = indexes or build_import_indexes()
+    if IMPORT_GRAPH["reach"] is None:
+        IMPORT_GRAPH["reach"] = build_reachability(imports)
+    return IMPORT_GRAPH["reach"]
+
+
+def import_clusters(imports, importers):
+    weights = {rel: {} for rel in imports}
+    for a, outs in imports.items():
+        for b in outs:
+            if a == b:
+                continue
+            w = 1 / len(importers[b])
+            weights[a][b] = weights[a].get(b, 0) + w
+            weights[b][a] = weights[b].get(a, 0) + w
+    label = {rel: rel for rel in imports}
+    order = sorted(imports, key=str.lower)
+    for _ in range(CLUSTER_ROUNDS):
+        moved = False
+        for rel in order:
+            scores = {}
+            for other, w in weights[rel].items():
+                scores[label[other]] = scores.get(label[other], 0) + w
+            if not scores:
+                continue
+            best = min(scores, key=lambda lab: (-scores[lab], lab))
+            if scores[best] > scores.get(label[rel], 0):
+                label[rel] = best
+                moved = True
+        if not moved:
+            break
+    return label
+
+
+def import_order_rank(mode, graph=None):
+    if graph is None:
+        indexes = build_import_indexes()
+        imports, importers, _ = indexes
+        comps = get_reachability(indexes)["comps"]
+    else:
+        imports, importers = graph
+        comps = strongly_connected_components(imports)
+    topo = [rel for comp in comps for rel in comp]
+    if mode == "cluster":
+        label = import_clusters(imports, importers)
+        position = {rel: i for i, rel in enumerate(topo)}
+        first = {}
+        for rel in topo:
+            first.setdefault(label[rel], position[rel])
+        topo.sort(key=lambda rel: (first[label[rel]], position[rel]))
+    return {rel: i for i, rel in enumerate(topo)}
+
+
+def trace_closure(starts, edges, depth=0):
+    seen = set(starts)
+    queue = deque((rel, 0) for rel in starts)
+    ordered = list(starts)
     while queue:
-        cur = queue.pop(0)
-        if cur in seen:
+        cur, dist = queue.popleft()
+        if depth and dist >= depth:
             continue
-        seen.add(cur)
-        ordered.append(cur)
-        for prv in sorted(importers.get(cur, ()), key=str.lower):
-            if prv not in seen:
-                queue.append(prv)
+        for nxt in sorted(edges.get(cur, ()), key=str.lower):
+            if nxt not in seen:
+                seen.add(nxt)
+                ordered.append(nxt)
+                queue.append((nxt, dist + 1))
+    return ordered
+
+
+def traced_closure(starts, side, depth, indexes):
+    imports, importers, _ = indexes
+    edges = importers if side == "reverse" else imports
+    if depth:
+        return trace_closure(starts, edges, depth)
+    memo = IMPORT_GRAPH["traces"]
+    key = (side, tuple(starts))
+    if key not in memo:
+        if len(memo) >= TRACE_MEMO_LIMIT:
+            memo.clear()
+        memo[key] = trace_closure(starts, edges)
+    return memo[key]
+
+
+def trace_paths(starts, direction, depth=0, indexes=None):
+    indexes = indexes or build_import_indexes()
+    sides = ("reverse", "forward") if direction == "both" else (direction,)
+    ordered = list(starts)
+    seen = set(starts)
+    for side in sides:
+        for rel in traced_closure(starts, side, depth, indexes):
+            if rel not in seen:
+                seen.add(rel)
+                ordered.append(rel)
     return ordered
 
 
-def write_trace(paths, label):
+def trace_cycles(starts, direction, indexes):
+    imports = indexes[0]
+    keep = set(trace_paths(starts, direction, 0, indexes))
+    sub = {rel: imports[rel] & keep for rel in keep}
+    return cycle_components(strongly_connected_components(sub), sub)
+
+
+def report_cycles(paths=None, cycles=None):
+    if cycles is None:
+        cycles = get_reachability()["cycles"]
+    if paths is not None:
+        wanted = set(paths)
+        cycles = [comp for comp in cycles if wanted.intersection(comp)]
+    for comp in cycles:
+        print(f"🔁 Import cycle ({len(comp)} file(s)): {' → '.join(comp + comp[:1])}")
+    return len(cycles)
+
+
+def run_cycles_command():
+    if not report_cycles():
+        print("✅ No import cycles in src.")
+
+
+def resolve_symbol_exports(rel, targets, files, memo, resolving):
+    if rel in memo:
+        return memo[rel]
+    if rel in resolving:
+        return {}
+    resolving.add(rel)
+    symbols = files[rel]["symbols"]
+    exports = {name: (rel, local) for name, local in symbols["exports"]}
+    for spec, orig, name in symbols["reexports"]:
+        target = targets[rel].get(spec)
+        if target is None or "symbols" not in files.get(target, {}):
+            continue
+        sub = resolve_symbol_exports(target, targets, files, memo, resolving)
+        if orig == "*":
+            for sub_name, origin in sub.items():
+                if sub_name != "default":
+                    exports.setdefault(sub_name, origin)
+        elif orig in sub:
+            exports.setdefault(name, sub[orig])
+    resolving.discard(rel)
+    memo[rel] = exports
+    return exports
+
+
+@profiled("resolve")
+def build_symbol_index():
+    _, _, all_paths = build_import_indexes()
+    if IMPORT_GRAPH["symbols"] is not None:
+        return IMPORT_GRAPH["symbols"]
+    files = get_import_cache()
+    all_set = set(all_paths)
+    rels = [rel for rel in all_paths if "symbols" in files.get(rel, {})]
+    targets = {}
+    for rel in rels:
+        symbols = files[rel]["symbols"]
+        specs = {spec for spec, _ in symbols["uses"]}
+        specs.update(spec for spec, _, _ in symbols["reexports"])
+        targets[rel] = {
+            spec: resolve_import_to_rel(rel, spec, all_set) for spec in specs
+        }
+    memo = {}
+    exporters = {}
+    names = {}
+    for rel in rels:
+        exports = resolve_symbol_exports(rel, targets, files, memo, set())
+        for name, origin in exports.items():
+            exporters.setdefault(origin, set()).add(rel)
+            for key in (name, origin[1]):
+                if key != "default":
+                    names.setdefault(key, set()).add(origin)
+    users = {}
+    for rel in rels:
+        for spec, imported in files[rel]["symbols"]["uses"]:
+            target = targets[rel][spec]
+            if target is None:
+                continue
+            provided = memo.get(target, {})
+            origins = provided.values() if imported == "*" else [provided.get(imported)]
+            for origin in origins:
+                if origin is not None:
+                    users.setdefault(origin, set()).add(rel)
+    IMPORT_GRAPH["symbols"] = {"names": names, "exporters": exporters, "users": users}
+    return IMPORT_GRAPH["symbols"]
+
+
+def symbol_paths(name):
+    index = build_symbol_index()
+    origins = sorted(index["names"].get(name, ()), key=lambda o: o[0].lower())
+    definers = [rel for rel, _ in origins]
+    related = set()
+    for origin in origins:
+        related |= index["exporters"].get(origin, set())
+        related |= index["users"].get(origin, set())
+    related.difference_update(definers)
+    return list(dict.fromkeys(definers)) + sorted(related, key=str.lower)
+
+
+def run_symbol_trace(name):
+    name = name.strip()
+    if not name:
+        print("⚠️ Usage: trace symbol <ExportedName>")
+        return
+    paths = symbol_paths(name)
+    if not paths:
+        print(f"❌ No exported symbol named '{name}'.")
+        return
+    write_trace(paths, f"symbol-{name}", lambda: symbol_paths(name))
+
+
+def write_trace(paths, label, rebuild_paths=None):
     blocks = collect_blocks_for_paths(paths)
     if not blocks:
         print("⚠️ No files in trace.")
         return
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
-    part_idx = 1
-    current_payloads = []
-    current_bytes = 0
-    written = 0
-
-    def flush_part():
-        nonlocal current_payloads, current_bytes, part_idx, written
-        if not current_payloads:
-            return
-        payload = BLOCK_SEP.join(current_payloads)
-        name = (
-            f"{timestamp}-trace-{label}.txt"
-            if part_idx == 1 and written == 0
-            else f"{timestamp}-trace-{label}-part-{part_idx:03d}.txt"
-        )
-        out_path = os.path.join(OUTPUT_DIR, name)
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(payload)
-        print(f"✅ Wrote {out_path}")
-        part_idx += 1
-        written += 1
-        current_payloads.clear()
-        current_bytes = 0
-
     print("\n📄 Building import trace...\n")
-    for b in blocks:
-        if current_bytes and current_bytes + b["bytes"] > SOFT_LIMIT:
-            flush_part()
-        if current_bytes + b["bytes"] > HARD_LIMIT:
-            flush_part()
-        current_payloads.append(b["text"])
-        current_bytes += b["bytes"]
-        print(f" - {b['header'].splitlines()[0]}")
-    flush_part()
+    rebuild = None
+    if rebuild_paths is not None:
+        rebuild = lambda: collect_blocks_for_paths(rebuild_paths())
+    written = write_block_parts(blocks, f"trace-{label}", rebuild=rebuild)
     print(f"\n✅ Trace written in {written} part(s)\n")
 
 
+def parse_trace_args(arg):
+    words = arg.split()
+    direction = SETTINGS["direction"]
+    depth = SETTINGS["depth"]
+    while words and words[0].startswith("-"):
+        flag = words.pop(0)
+        if flag in TRACE_FLAGS:
+            direction = TRACE_FLAGS[flag]
+        elif flag == "-d" and words and words[0].isdigit():
+            depth = int(words.pop(0))
+        else:
+            raise ValueError(f"unknown trace option '{flag}'")
+    return direction, depth, split_commalist(" ".join(words))
+
+
 def run_trace_command(arg):
+    if arg.strip().lower().startswith("symbol "):
+        run_symbol_trace(arg.strip()[7:])
+        return
+    usage = "⚠️ Usage: trace [-r|-f|-b] [-d DEPTH] <file>[,<file>...]"
+    try:
+        direction, depth, tokens = parse_trace_args(arg)
+    except ValueError as e:
+        print(f"{usage} ({e})")
+        return
+    if not tokens:
+        print(usage)
+        return
+    indexes = build_import_indexes()
+    all_paths = indexes[2]
+    starts = []
+    for tok in tokens:
+        rel, err = resolve_single_file(tok, all_paths)
+        if not rel:
+            print(f"❌ Start file not found: {tok}")
+            continue
+        if err and err.startswith("ambiguous"):
+            print(f"⚠️ {tok} -> {rel} ({err})")
+        if rel not in starts:
+            starts.append(rel)
+    if not starts:
+        return
+    chain = trace_paths(starts, direction, depth, indexes)
+    report_cycles(chain, trace_cycles(starts, direction, indexes))
+    label = os.path.basename(starts[0])
+    if len(starts) > 1:
+        label += f"+{len(starts) - 1}"
+    if direction != "reverse":
+        label = f"{direction}-{label}"
+    write_trace(chain, label, lambda: trace_paths(starts, direction, depth))
+
+
+WORKSPACE_DEFAULTS = {
+    "nx.json": ("apps/*", "libs/*"),
+    "turbo.json": ("apps/*", "packages/*"),
+}
+PNPM_LIST_ITEM_RE = re.compile(r"""^\s+-\s*(['"]?)(.+?)\1\s*(?:#.*)?$""")
+ENTRY_FIELDS = ("source", "module", "main", "types")
+SCRIPT_EXT_RE = re.compile(r"(?:\.d)?\.[cm]?[jt]sx?$")
+
+
+def read_project_json(rel):
+    try:
+        with open(os.path.join(PROJECT_ROOT, rel), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def pnpm_workspace_patterns():
+    try:
+        with open(
+            os.path.join(PROJECT_ROOT, "pnpm-workspace.yaml"), encoding="utf-8"
+        ) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    patterns = []
+    in_packages = False
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if not line[0].isspace():
+            in_packages = line.split(":", 1)[0].strip() == "packages"
+            continue
+        m = PNPM_LIST_ITEM_RE.match(line)
+        if in_packages and m:
+            patterns.append(m.group(2))
+    return patterns
+
+
+def workspace_patterns():
+    patterns = pnpm_workspace_patterns()
+    for name in ("package.json", "lerna.json"):
+        data = read_project_json(name) or {}
+        listed = data.get("workspaces" if name == "package.json" else "packages")
+        if isinstance(listed, dict):
+            listed = listed.get("packages")
+        if isinstance(listed, list):
+            patterns += [p for p in listed if isinstance(p, str)]
+    nx = read_project_json("nx.json")
+    if nx is not None and not patterns:
+        layout = nx.get("workspaceLayout") or {}
+        patterns += [
+            f"{layout.get('appsDir', 'apps')}/*",
+            f"{layout.get('libsDir', 'libs')}/*",
+        ]
+    for name, defaults in WORKSPACE_DEFAULTS.items():
+        if not patterns and os.path.exists(os.path.join(PROJECT_ROOT, name)):
+            patterns += defaults
+    return list(dict.fromkeys(patterns))
+
+
+def package_entries(manifest, pkg_rel, src_rel):
+    fields = [manifest.get(field) for field in ENTRY_FIELDS]
+    exports = manifest.get("exports")
+    if isinstance(exports, dict):
+        exports = exports.get(".", exports)
+        if isinstance(exports, dict):
+            exports = exports.get("import") or exports.get("default")
+    fields.append(exports)
+    entries = []
+    for field in fields:
+        if not isinstance(field, str):
+            continue
+        rel = normalize_rel(os.path.normpath(os.path.join(pkg_rel, field)))
+        if src_rel != pkg_rel:
+            if not rel.startswith(src_rel + "/"):
+                continue
+            rel = rel[len(src_rel) + 1 :]
+        elif pkg_rel != ".":
+            rel = rel[len(pkg_rel) + 1 :]
+        entries.append(SCRIPT_EXT_RE.sub("", rel))
+    entries.append("index")
+    return list(dict.fromkeys(entries))
+
+
+def discover_workspaces():
+    patterns = workspace_patterns()
+    excludes = [p[1:].rstrip("/") for p in patterns if p.startswith("!")]
+    found = set()
+    for pattern in patterns:
+        if pattern.startswith("!"):
+            continue
+        for path in glob.glob(
+            os.path.join(PROJECT_ROOT, pattern.rstrip("/")), recursive=True
+        ):
+            rel = normalize_rel(os.path.relpath(path, PROJECT_ROOT))
+            if IGNORE_DIRS.intersection(rel.split("/")) or rel.startswith(".."):
+                continue
+            if any(fnmatch.fnmatch(rel, ex) for ex in excludes):
+                continue
+            if os.path.isfile(os.path.join(path, "package.json")) or os.path.isfile(
+                os.path.join(path, "project.json")
+            ):
+                found.add(rel)
+    packages = []
+    for rel in sorted(found, key=str.lower):
+        manifest = read_project_json(f"{rel}/package.json") or {}
+        src_rel = (
+            f"{rel}/src"
+            if os.path.isdir(os.path.join(PROJECT_ROOT, rel, "src"))
+            else rel
+        )
+        packages.append(
+            {
+                "dir": rel,
+                "name": manifest.get("name") or rel,
+                "src": os.path.join(PROJECT_ROOT, src_rel),
+                "prefix": "" if src_rel == "." else src_rel,
+                "entries": package_entries(manifest, rel, src_rel),
+            }
+        )
+    return packages
+
+
+def is_bare_spec(spec):
+    return not spec.startswith((".", "/", "@/", "~/")) and ":" not in spec
+
+
+def scan_workspace(src_dir, cache_dir, profile):
+    global SRC_DIR, CACHE_DIR
+    SRC_DIR, CACHE_DIR = src_dir, cache_dir
+    SNAPSHOTS.clear()
+    SNAPSHOT_CACHE.update(entries=None, dirty=False)
+    CONTENT_CACHE.update(entries=None, dirty=False)
+    IMPORT_GRAPH.update(
+        files=None, signature=None, indexes=None, reach=None, symbols=None
+    )
+    IMPORT_GRAPH["dirty"] = False
+    PROFILE.update(enabled=profile, phases={})
+    imports, _, paths = build_import_indexes()
+    records = get_import_cache()
+    prefix = cache_key(src_dir) + "/"
+    entries = {k: v for k, v in get_content_cache().items() if k.startswith(prefix)}
+    save_snapshot_cache()
+    save_content_cache()
+    save_import_cache()
+    return {
+        "paths": paths,
+        "imports": {rel: sorted(outs) for rel, outs in imports.items()},
+        "bare": {
+            rel: [spec for spec in records[rel]["specs"] if is_bare_spec(spec)]
+            for rel in paths
+            if rel in records
+        },
+        "entries": entries,
+        "phases": PROFILE["phases"],
+    }
+
+
+def resolve_workspace_spec(spec, packages, path_sets):
+    for i in sorted(range(len(packages)), key=lambda i: -len(packages[i]["name"])):
+        name = packages[i]["name"]
+        if spec != name and not spec.startswith(name + "/"):
+            continue
+        sub = spec[len(name) + 1 :]
+        candidates = [sub, sub[4:] if sub.startswith("src/") else None]
+        if not sub:
+            candidates = packages[i]["entries"]
+        for candidate in candidates:
+            resolved = candidate and try_resolve_with_exts(candidate, path_sets[i])
+            if resolved:
+                return i, resolved
+        return None
+    return None
+
+
+def merge_workspace_graph(packages, results):
+    imports = {}
+    links = {}
+    path_sets = [set(r["paths"]) for r in results]
+    content = get_content_cache()
+    for i, (pkg, result) in enumerate(zip(packages, results)):
+        content.update(result["entries"])
+        for rel in result["paths"]:
+            imports[join_rel(pkg["prefix"], rel)] = {
+                join_rel(pkg["prefix"], dep) for dep in result["imports"][rel]
+            }
+        for rel, specs in result["bare"].items():
+            for spec in specs:
+                target = resolve_workspace_spec(spec, packages, path_sets)
+                if target is None or target[0] == i:
+                    continue
+                j, dep = target
+                imports[join_rel(pkg["prefix"], rel)].add(
+                    join_rel(packages[j]["prefix"], dep)
+                )
+                links[(i, j)] = links.get((i, j), 0) + 1
+    importers = {rel: set() for rel in imports}
+    for a, outs in imports.items():
+        for b in outs:
+            importers[b].add(a)
+    return imports, importers, links
+
+
+def scan_workspaces(packages):
+    processes = max(1, min(SETTINGS["processes"], len(packages)))
+    jobs = [
+        (
+            pkg["src"],
+            os.path.join(CACHE_DIR, "workspaces", pkg["dir"].replace("/", "__")),
+            PROFILE["enabled"],
+        )
+        for pkg in packages
+    ]
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(scan_workspace, *zip(*jobs)))
+    elapsed = time.perf_counter() - t0
+    if PROFILE["enabled"]:
+        with PROFILE_LOCK:
+            for result in results:
+                for name, r in result["phases"].items():
+                    record = phase_record(name)
+                    for field, value in r.items():
+                        record[field] += value
+    files = sum(len(r["paths"]) for r in results)
+    print(
+        f"📦 Scanned {len(packages)} package(s), {files} file(s) in {elapsed:.2f}s"
+        f" with {processes} process(es)"
+    )
+    imports, importers, links = merge_workspace_graph(packages, results)
+    WORKSPACES.update(packages=packages, graph=(imports, importers), links=links)
+    return results
+
+
+def workspace_summary_block(packages, results, links):
+    lines = [f"// --- workspaces ({len(packages)} packages) ---"]
+    for pkg, result in zip(packages, results):
+        lines.append(f"{pkg['dir']}  {pkg['name']}  {len(result['paths'])} file(s)")
+    if links:
+        lines.append("")
+        lines.append("cross-package imports:")
+        for (i, j), n in sorted(links.items()):
+            lines.append(f"{packages[i]['dir']} -> {packages[j]['dir']}  ({n})")
+    text = "\n".join(lines)
+    return text_block_spec("workspaces", lines[0], text)
+
+
+def collect_workspace_blocks(packages):
+    results = scan_workspaces(packages)
+    imports, importers = WORKSPACES["graph"]
+    items = []
+    for pkg, result in zip(packages, results):
+        items += [
+            (join_rel(pkg["prefix"], rel), os.path.join(pkg["src"], rel))
+            for rel in result["paths"]
+        ]
+    items.sort(key=lambda item: item[0].lower())
+    if SETTINGS["order"] != "path":
+        rank = import_order_rank(SETTINGS["order"], (imports, importers))
+        items.sort(key=lambda item: rank.get(item[0], len(rank)))
+    summary = workspace_summary_block(packages, results, WORKSPACES["links"])
+    return itertools.chain([summary], iter_block_specs(items))
+
+
+def write_workspace_parts():
+    packages = discover_workspaces()
+    if not packages:
+        print(
+            "⚠️ No workspace packages found (pnpm-workspace.yaml, package.json"
+            " workspaces, lerna.json, nx.json or turbo.json)."
+        )
+        return
+    print(f"\n📄 Scanning {len(packages)} workspace package(s)...\n")
+    written = write_block_parts(
+        collect_workspace_blocks(packages),
+        "workspaces",
+        numbered=True,
+        rebuild=lambda: collect_workspace_blocks(discover_workspaces()),
+    )
+    print(f"\n✅ Workspaces written in {written} part(s)\n")
+
+
+TRIGRAM_INDEX = {
+    "files": None,
+    "postings": None,
+    "next": 0,
+    "dead": 0,
+    "stamp": None,
+    "dirty": False,
+}
+REGEX_META = set(".^$*+?{}[]()|\\")
+REGEX_COUNT_RE = re.compile(r"\{(?:\d+(?:,\d*)?|,\d+)\}")
+
+
+def file_trigrams(abs_path):
+    entry = file_entry(abs_path)
+    if entry is None or entry["err"]:
+        return set()
+    _, lines, _ = read_cached_lines(abs_path)
+    text = "\n".join(lines).lower()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def trigram_ids(postings, gram):
+    ids = postings.get(gram, "")
+    if isinstance(ids, str):
+        ids = set(ids.split())
+        if gram in postings:
+            postings[gram] = ids
+    return ids
+
+
+@profiled("index")
+def get_trigram_index():
+    if TRIGRAM_INDEX["files"] is None:
+        data = load_json_cache("trigrams.json")
+        TRIGRAM_INDEX["files"] = data.get("files", {})
+        TRIGRAM_INDEX["postings"] = data.get("postings", {})
+        TRIGRAM_INDEX["next"] = data.get("next", 0)
+        TRIGRAM_INDEX["dead"] = data.get("dead", 0)
+    files = TRIGRAM_INDEX["files"]
+    postings = TRIGRAM_INDEX["postings"]
+    snap = get_snapshot()
+    stamp = TRIGRAM_INDEX["stamp"]
+    if stamp is not None and stamp[0] is snap and stamp[1] == snap["generation"]:
+        return files, postings
+    TRIGRAM_INDEX["stamp"] = (snap, snap["generation"])
+    current = {
+        rel: [meta["size"], meta["mtime_ns"]]
+        for rel, meta in snap["files"].items()
+        if not is_binary_path(rel)
+    }
+    changed = [rel for rel, meta in current.items() if files.get(rel, [0])[1:] != meta]
+    removed = [rel for rel in files if rel not in current]
+    if not changed and not removed:
+        return files, postings
+    for rel in removed:
+        del files[rel]
+    TRIGRAM_INDEX["dead"] += len(removed) + sum(rel in files for rel in changed)
+    for rel in changed:
+        rel_id = str(TRIGRAM_INDEX["next"])
+        TRIGRAM_INDEX["next"] += 1
+        for gram in file_trigrams(snapshot_abs(snap, rel)):
+            ids = trigram_ids(postings, gram)
+            ids.add(rel_id)
+            postings[gram] = ids
+        files[rel] = [rel_id] + current[rel]
+    if TRIGRAM_INDEX["dead"] > len(files):
+        live = {record[0] for record in files.values()}
+        for gram in list(postings):
+            ids = trigram_ids(postings, gram) & live
+            if ids:
+                postings[gram] = ids
+            else:
+                del postings[gram]
+        TRIGRAM_INDEX["dead"] = 0
+    TRIGRAM_INDEX["dirty"] = True
+    return files, postings
+
+
+def save_trigram_index():
+    if not TRIGRAM_INDEX["dirty"]:
+        return
+    postings = {
+        gram: ids if isinstance(ids, str) else " ".join(sorted(ids, key=int))
+        for gram, ids in TRIGRAM_INDEX["postings"].items()
+    }
+    save_json_cache(
+        "trigrams.json",
+        {
+            "files": TRIGRAM_INDEX["files"],
+            "postings": postings,
+            "next": TRIGRAM_INDEX["next"],
+            "dead": TRIGRAM_INDEX["dead"],
+        },
+    )
+    TRIGRAM_INDEX["dirty"] = False
+
+
+def regex_literals(pattern):
+    if "|" in pattern:
+        return []
+    literals = []
+    run = ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            i += 2
+            if depth == 0 and not nxt.isalnum():
+                run += nxt
+                continue
+            literals.append(run)
+            run = ""
+            continue
+        i += 1
+        quantifier = REGEX_COUNT_RE.match(pattern, i - 1) if ch == "{" else None
+        if quantifier:
+            i = quantifier.end()
+            if depth == 0:
+                run = run[:-1]
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and ch in "?*":
+            run = run[:-1]
+        elif depth == 0 and ch not in REGEX_META:
+            run += ch
+            continue
+        literals.append(run)
+        run = ""
+    literals.append(run)
+    return [lit for lit in literals if len(lit) >= 3]
+
+
+def parse_grep_pattern(arg):
     arg = arg.strip()
-    if not arg:
-        print("⚠️ Usage: trace <filename or src path>")
+    if len(arg) > 2 and arg.startswith("/") and arg.endswith("/"):
+        body = arg[1:-1]
+        return re.compile(body), regex_literals(body)
+    return re.compile(re.escape(arg)), [arg]
+
+
+def grep_candidates(literals):
+    files, postings = get_trigram_index()
+    candidates = None
+    for literal in literals:
+        lower = literal.lower()
+        for i in range(len(lower) - 2):
+            found = trigram_ids(postings, lower[i : i + 3])
+            candidates = set(found) if candidates is None else candidates & found
+            if not candidates:
+                return set()
+    if candidates is None:
+        return set(files)
+    return {rel for rel, record in files.items() if record[0] in candidates}
+
+
+def grep_matches(pattern, literals):
+    candidates = grep_candidates(literals)
+    matches = []
+    for rel in sorted(candidates, key=str.lower):
+        text = read_file_text(os.path.join(SRC_DIR, rel))
+        hits = sum(1 for line in text.splitlines() if pattern.search(line))
+        if hits:
+            matches.append((rel, hits))
+    return candidates, matches
+
+
+def run_grep_command(arg):
+    if not arg.strip():
+        print("⚠️ Usage: grep TEXT  or  grep /REGEX/")
         return
-    imports, importers, all_paths = build_import_indexes()
-    rel, err = resolve_single_file(arg, all_paths)
-    if not rel:
-        print(f"❌ Start file not found: {arg}")
+    try:
+        pattern, literals = parse_grep_pattern(arg)
+    except re.error as e:
+        print(f"❌ Invalid pattern: {e}")
         return
-    if err and err.startswith("ambiguous"):
-        print(f"⚠️ {arg} -> {rel} ({err})")
-    chain = trace_closure(rel, imports, importers)
-    if not chain:
-        print("⚠️ Nothing to trace.")
+    t0 = time.perf_counter()
+    candidates, matches = grep_matches(pattern, literals)
+    elapsed = (time.perf_counter() - t0) * 1000
+    print(
+        f"\n🔎 {len(candidates)} candidate(s) from the trigram index,"
+        f" {len(matches)} matching file(s) in {elapsed:.1f} ms\n"
+    )
+    if not matches:
+        print("⚠️ No matching files.")
         return
-    label = os.path.basename(rel)
-    write_trace(chain, label)
+    for rel, hits in matches:
+        print(f" - {rel} ({hits} line(s))")
+    blocks = collect_blocks_for_paths([rel for rel, _ in matches])
+    label = re.sub(r"[^\w.-]+", "_", arg.strip()).strip("_")[:40] or "pattern"
+    print()
+    written = write_block_parts(
+        blocks,
+        f"grep-{label}",
+        show_headers=False,
+        rebuild=lambda: collect_blocks_for_paths(
+            [rel for rel, _ in grep_matches(pattern, literals)[1]]
+        ),
+    )
+    print(f"\n✅ Grep results written in {written} part(s)\n")
 
 
-def main():
-    if not os.path.exists(SRC_DIR):
-        print(f"❌ Source directory not found: {SRC_DIR}")
-        sys.exit(1)
+@profiled("cache")
+def save_caches():
+    save_snapshot_cache()
+    save_content_cache()
+    save_import_cache()
+    save_token_cache()
+    save_trigram_index()
+
+
+def parse_setting(key, value):
+    if key == "pack":
+        if value not in PACK_MODES:
+            raise ValueError(
+                f"Unknown pack mode '{value}'. Use one of: {', '.join(PACK_MODES)}"
+            )
+        return value
+    if key in ("workers", "processes"):
+        if not value.isdigit() or int(value) < 1:
+            raise ValueError(f"{key} must be a positive integer")
+        return int(value)
+    if key == "tokens":
+        if not value.isdigit():
+            raise ValueError("tokens must be a token budget, or 0 for byte limits")
+        return int(value)
+    if key == "direction":
+        if value not in TRACE_DIRECTIONS:
+            raise ValueError(
+                f"Unknown direction '{value}'. Use one of: {', '.join(TRACE_DIRECTIONS)}"
+            )
+        return value
+    if key == "depth":
+        if not value.isdigit():
+            raise ValueError("depth must be a number of hops, or 0 for no limit")
+        return int(value)
+    if key == "tree":
+        if not value.isdigit():
+            raise ValueError("tree must be a folder depth, or 0 for the full tree")
+        return int(value)
+    if key in ("dedupe", "compact"):
+        if value not in ("on", "off"):
+            raise ValueError(f"{key} must be 'on' or 'off'")
+        return value == "on"
+    if key == "order":
+        if value not in ORDER_MODES:
+            raise ValueError(
+                f"Unknown order '{value}'. Use one of: {', '.join(ORDER_MODES)}"
+            )
+        return value
+    if key == "format":
+        if value not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"Unknown format '{value}'. Use one of: {', '.join(OUTPUT_FORMATS)}"
+            )
+        return value
+    if key == "estimator":
+        if value not in TOKEN_ESTIMATORS:
+            raise ValueError(
+                f"Unknown estimator '{value}'. Use one of: {', '.join(TOKEN_ESTIMATORS)}"
+            )
+        return value
+    return value
+
+
+def apply_env_setting(key, var):
+    value = os.environ.get(var, "")
+    if not value.strip():
+        return
+    try:
+        SETTINGS[key] = parse_setting(key, value.strip())
+    except ValueError as e:
+        print(f"⚠️ Ignoring {var}={value!r}: {e}", file=sys.stderr)
+
+
+apply_env_setting("workers", "SCAN_READ_WORKERS")
+
+
+def apply_setting(arg):
+    parts = arg.split()
+    if len(parts) != 2 or parts[0].lower() not in SETTINGS:
+        print(f"⚠️ Usage: set <{'|'.join(SETTINGS)}> <value>")
+        return
+    key = parts[0].lower()
+    try:
+        value = parse_setting(key, parts[1].lower())
+    except ValueError as e:
+        print(f"⚠️ {e}")
+        return
+    SETTINGS[key] = value
+    print(f"⚙️ {key} = {value}")
+
+
+def write_config_bundle():
+    print("\n📄 Scanning repository configs...\n")
+    entries = collect_config_files(PROJECT_ROOT)
+    if not entries:
+        print("⚠️ No config files found.")
+        return
+    for entry in entries:
+        header = entry.split("\n", 1)[0]
+        print(f" - {header}")
+    write_output_file(entries, "configs")
+
+
+def write_type_bundle(exts):
+    print(f"\n📄 Scanning by types {', '.join(exts)}...\n")
+    entries = collect_file_contents_by_types(SRC_DIR, exts)
+    if not entries:
+        print("⚠️ No matching files found.")
+        return
+    for entry in entries:
+        header = entry.split("\n", 1)[0]
+        print(f" - {header}")
+    label = "types-" + "-".join(e.lstrip(".").replace("*", "star") for e in exts)
+    write_output_file(entries, label)
+
+
+def write_directory_bundle(q):
+    target_path = resolve_path_query(SRC_DIR, q)
+    if not target_path:
+        target_path = find_directory_by_name(SRC_DIR, q)
+    if not target_path:
+        print(f"⚠️ Folder '{q}' not found. Try again with a more specific path.")
+        return
+    rel_label = os.path.relpath(target_path, SRC_DIR).replace(os.sep, "_")
+    print(f"\n📄 Scanning files under '{os.path.relpath(target_path, SRC_DIR)}'...\n")
+    entries = collect_file_contents(target_path)
+    if not entries:
+        print("⚠️ No files found in this folder.")
+        return
+    for entry in entries:
+        header = entry.split("\n", 1)[0]
+        print(f" - {header}")
+    write_output_file(entries, rel_label)
+
+
+def run_query(q):
+    if q.lower().startswith("set "):
+        apply_setting(q[4:])
+        return
+    if q.lower() == "tree" or q.lower().startswith("tree "):
+        run_tree_command(q[5:])
+        return
+    if q.lower().startswith("trace "):
+        run_trace_command(q[6:])
+        return
+    if q.lower().startswith("grep "):
+        run_grep_command(q[5:])
+        return
+    if q.lower() == "watch":
+        run_watch()
+        return
+    if q.lower() == "cycles":
+        run_cycles_command()
+        return
+    if q.lower() == "config":
+        write_config_bundle()
+        return
+    if q.lower() == "codebase":
+        write_codebase_parts()
+        return
+    if q.lower() == "workspaces":
+        write_workspace_parts()
+        return
+    if q.lower() == "delta" or q.lower().startswith("delta "):
+        write_delta_parts(q[6:].strip() or None)
+        return
+    if q.lower().startswith("since ") and q[6:].strip():
+        write_delta_parts(q[6:].strip())
+        return
+    tokens = tokenize_commalist(q)
+    if tokens:
+        write_selected_files(tokens)
+        return
+    basename = is_single_basename_query(q)
+    if basename:
+        write_found_by_basename(basename)
+        return
+    if is_type_query(q):
+        write_type_bundle(parse_extensions(q))
+    else:
+        write_directory_bundle(q)
+
+
+BATCH_QUERIES = {
+    "codebase": (0, lambda: write_codebase_parts()),
+    "workspaces": (0, lambda: write_workspace_parts()),
+    "delta": (0, lambda arg=None: write_delta_parts(arg)),
+    "since": (1, lambda arg: write_delta_parts(arg)),
+    "config": (0, lambda: write_config_bundle()),
+    "trace": (1, lambda arg: run_trace_command(arg)),
+    "cycles": (0, lambda: run_cycles_command()),
+    "tree": (1, lambda arg: run_tree_command(arg)),
+    "symbol": (1, lambda arg: run_symbol_trace(arg)),
+    "grep": (1, lambda arg: run_grep_command(arg)),
+    "watch": (0, lambda: run_watch()),
+    "types": (1, lambda arg: write_type_bundle(parse_extensions(arg))),
+    "files": (1, lambda arg: write_selected_files(split_commalist(arg))),
+    "find": (1, lambda arg: write_found_by_basename(os.path.basename(arg))),
+    "dir": (1, lambda arg: write_directory_bundle(arg)),
+}
+BATCH_OPTIONAL_ARG = {"delta"}
+
+
+def split_commalist(arg):
+    return [t.strip() for t in arg.split(",") if t.strip()]
+
+
+def group_batch_queries(parser, words):
+    queries = []
+    i = 0
+    while i < len(words):
+        name = words[i].lower()
+        if name not in BATCH_QUERIES:
+            parser.error(
+                f"unknown query '{words[i]}' (expected one of: {', '.join(BATCH_QUERIES)})"
+            )
+        arity = BATCH_QUERIES[name][0]
+        if (
+            name in BATCH_OPTIONAL_ARG
+            and i + 1 < len(words)
+            and words[i + 1].lower() not in BATCH_QUERIES
+        ):
+            arity = 1
+        args = words[i + 1 : i + 1 + arity]
+        if len(args) < arity:
+            parser.error(f"'{name}' needs an argument")
+        queries.append((name, args))
+        i += 1 + arity
+    return queries
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Bundle the src/ tree into text parts. Without queries an interactive prompt starts.",
+        epilog=(
+            "queries (any number, run in order against one shared snapshot):\n"
+            "  codebase              whole src tree\n"
+            "  workspaces            every monorepo package, scanned in parallel\n"
+            "  delta [REV]           files changed since the last codebase/delta run,\n"
+            "                        or since git revision REV\n"
+            "  since REV             same as 'delta REV'\n"
+            "  config                repository config files\n"
+            "  trace FILE[,FILE]     FILE plus everything that imports it\n"
+            "                        (see --direction and --depth)\n"
+            "  cycles                import cycles in src\n"
+            "  tree PATH             one folder of the src tree (see --tree-depth)\n"
+            "  symbol NAME           file exporting NAME plus barrels and importers of it\n"
+            "  grep TEXT|/REGEX/     files whose content matches\n"
+            "  watch                 keep the previous bundle up to date as src changes\n"
+            "  types .ts,.tsx        all files with these extensions\n"
+            "  files a.ts,b/c.tsx    the listed files\n"
+            "  find NAME             every file called NAME\n"
+            "  dir PATH              one folder, e.g. components/blog\n"
+            "\nexample: scan_codebase.py --pack ordered codebase config trace Card.tsx"
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("queries", nargs="*", metavar="QUERY")
+    parser.add_argument("--pack", choices=PACK_MODES, help="part packing mode")
+    parser.add_argument("--workers", type=int, help="file reader threads")
+    parser.add_argument(
+        "--processes", type=int, help="workspace packages scanned in parallel"
+    )
+    parser.add_argument(
+        "--tokens",
+        type=int,
+        metavar="BUDGET",
+        help="pack parts up to an estimated token budget instead of byte limits",
+    )
+    parser.add_argument(
+        "--estimator", choices=list(TOKEN_ESTIMATORS), help="token estimator"
+    )
+    parser.add_argument(
+        "--direction",
+        choices=TRACE_DIRECTIONS,
+        help="follow importers (reverse), imports (forward) or both in traces",
+    )
+    parser.add_argument(
+        "--depth", type=int, help="trace at most this many import hops (0 = all)"
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="strip comments and collapse whitespace in TS/JS/CSS blocks",
+    )
+    parser.add_argument(
+        "--no-dedupe",
+        action="store_true",
+        help="write identical files in full instead of stubbing repeats",
+    )
+    parser.add_argument(
+        "--order",
+        choices=ORDER_MODES,
+        help="order codebase files by path (default), dependencies first (topo),"
+        " or by clusters of files that import each other (cluster)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        help="write loose .txt parts (default), or one .jsonl/.zip archive"
+        " plus an index of where each file starts",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print time, files and bytes per phase after each query",
+    )
+    parser.add_argument(
+        "--profile-json", metavar="PATH", help="also write the phase profiles as JSON"
+    )
+    parser.add_argument(
+        "--cprofile", metavar="PATH", help="write cProfile stats for the whole run"
+    )
+    parser.add_argument(
+        "--tree", action="store_true", help="print the src tree before batch queries"
+    )
+    parser.add_argument(
+        "--tree-depth",
+        type=int,
+        metavar="N",
+        help="folder levels shown in the src tree (default 2, 0 for all)",
+    )
+    return parser
+
+
+def run_profiled(label, fn, *args):
+    if PROFILE["enabled"]:
+        start_profile()
+    fn(*args)
+    save_caches()
+    if PROFILE["enabled"]:
+        finish_profile(label)
+
+
+def run_batch(queries):
+    for name, args in queries:
+        run_profiled(" ".join([name, *args]), BATCH_QUERIES[name][1], *args)
+
+
+def print_tree(path=None, depth=None):
+    path = path or SRC_DIR
+    depth = SETTINGS["tree"] if depth is None else depth
+    snap = get_snapshot()
+    rel_dir = snapshot_rel(snap, path)
     print(f"📁 Project structure under:\n")
-    print("src/")
-    tree = build_tree(SRC_DIR, prefix="│   ")
+    label = f"src/{rel_dir}/" if rel_dir else "src/"
+    print(f"{label} {format_totals(snapshot_totals(snap)[rel_dir])}")
+    tree = build_tree(path, prefix="│   ", snap=snap, depth=depth)
     for line in tree:
         print(line)
+    if depth:
+        print(f"\n   (depth {depth}; 'tree <folder> [depth]' expands a folder)")
+
+
+def find_tree_folder(q):
+    if not q:
+        return SRC_DIR
+    return resolve_path_query(SRC_DIR, q) or find_directory_by_name(SRC_DIR, q)
+
+
+def parse_tree_args(arg):
+    words = arg.split()
+    depth = SETTINGS["tree"]
+    if len(words) >= 2 and words[-2] in ("-d", "--depth") and words[-1].isdigit():
+        depth = int(words.pop())
+        words.pop()
+    elif words and words[-1].isdigit() and not find_tree_folder(" ".join(words)):
+        depth = int(words.pop())
+    return " ".join(words), depth
+
+
+def run_tree_command(arg):
+    q, depth = parse_tree_args(arg)
+    path = find_tree_folder(q)
+    if not path:
+        print(f"⚠️ Folder '{q}' not found. Try again with a more specific path.")
+        return
+    print_tree(path, depth)
+
+
+def main():
+    parser = build_arg_parser()
+    args = parser.parse_intermixed_args()
+    queries = group_batch_queries(parser, args.queries)
+    if args.pack:
+        SETTINGS["pack"] = args.pack
+    if args.tree_depth is not None:
+        if args.tree_depth < 0:
+            parser.error("--tree-depth must be a folder depth, or 0 for the full tree")
+        SETTINGS["tree"] = args.tree_depth
+    if args.workers is not None:
+        if args.workers < 1:
+            parser.error("--workers must be a positive integer")
+        SETTINGS["workers"] = args.workers
+    if args.processes is not None:
+        if args.processes < 1:
+            parser.error("--processes must be a positive integer")
+        SETTINGS["processes"] = args.processes
+    if args.tokens is not None:
+        if args.tokens < 0:
+            parser.error("--tokens must be a token budget, or 0 for byte limits")
+        SETTINGS["tokens"] = args.tokens
+    if args.estimator:
+        SETTINGS["estimator"] = args.estimator
+    if args.no_dedupe:
+        SETTINGS["dedupe"] = False
+    if args.compact:
+        SETTINGS["compact"] = True
+    if args.order:
+        SETTINGS["order"] = args.order
+    if args.format:
+        SETTINGS["format"] = args.format
+    if args.direction:
+        SETTINGS["direction"] = args.direction
+    if args.depth is not None:
+        if args.depth < 0:
+            parser.error("--depth must be a number of hops, or 0 for no limit")
+        SETTINGS["depth"] = args.depth
+    only_workspaces = queries and all(name == "workspaces" for name, _ in queries)
+    if not os.path.exists(SRC_DIR) and not only_workspaces:
+        print(f"❌ Source directory not found: {SRC_DIR}")
+        sys.exit(1)
+    PROFILE["enabled"] = args.profile or bool(args.profile_json)
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler:
+        profiler.enable()
+    try:
+        run_session(queries, args.tree)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+            print(f"\n✅ cProfile stats written to {args.cprofile}")
+        if args.profile_json:
+            save_profile_json(args.profile_json)
+
+
+def run_session(queries, show_tree):
+    if queries:
+        if show_tree:
+            print_tree()
+        run_batch(queries)
+        return
+    print_tree()
     while True:
         q = input(
             "\n🔍 Enter folder name, file types (.js,.ts,...) or 'config', 'codebase', 'trace <file>' (or 'exit')\n"
-            "    ➤ Path queries are supported, e.g. 'src/components', 'components/forms'\n> "
+            "    ➤ Path queries are supported, e.g. 'src/components', 'components/forms'\n"
+            "    ➤ 'tree <folder> [depth]' expands one folder of the tree above ('-d N' if the folder is a number)\n"
+            "    ➤ 'trace [-r|-f|-b] [-d N] a.ts,b.tsx' traces importers, imports or both; 'cycles' lists import cycles\n"
+            "    ➤ 'trace symbol NAME' bundles the file exporting NAME and the files importing it\n"
+            "    ➤ 'grep TEXT' or 'grep /REGEX/' bundles the files whose content matches\n"
+            "    ➤ 'watch' rewrites the parts of the last bundle whenever src changes\n"
+            "    ➤ 'workspaces' bundles every package of a pnpm/yarn/nx/turbo monorepo\n"
+            "    ➤ 'delta' bundles changes since the last run, 'delta <rev>' or 'since <rev>' since a git revision\n"
+            "    ➤ 'set pack greedy|ordered|ffd' changes how blocks are packed into parts\n"
+            "    ➤ 'set workers N' changes how many threads read files\n"
+            "    ➤ 'set tokens N' packs parts up to N estimated tokens ('set tokens 0' for bytes)\n"
+            "    ➤ 'set dedupe on|off' stubs files identical to one already bundled\n"
+            "    ➤ 'set compact on|off' strips comments and whitespace from TS/JS/CSS\n"
+            "    ➤ 'set order path|topo|cluster' keeps files that import each other in the same part\n"
+            "    ➤ 'set format txt|jsonl|zip' writes one indexed archive instead of .txt parts\n> "
         ).strip()
         if q.lower() == "exit":
             break
-        if q.lower().startswith("trace "):
-            run_trace_command(q[6:])
-            continue
-        if q.lower() == "config":
-            print("\n📄 Scanning repository configs...\n")
-            entries = collect_config_files(PROJECT_ROOT)
-            if not entries:
-                print("⚠️ No config files found.")
-                continue
-            for entry in entries:
-                header = entry.split("\n", 1)[0]
-                print(f" - {header}")
-            write_output_file(entries, "configs")
-            continue
-        if q.lower() == "codebase":
-            write_codebase_parts()
-            continue
-        tokens = tokenize_commalist(q)
-        if tokens:
-            write_selected_files(tokens)
-            continue
-        basename = is_single_basename_query(q)
-        if basename:
-            write_found_by_basename(basename)
-            continue
-        if is_type_query(q):
-            exts = parse_extensions(q)
-            print(f"\n📄 Scanning by types {', '.join(exts)}...\n")
-            entries = collect_file_contents_by_types(SRC_DIR, exts)
-            if not entries:
-                print("⚠️ No matching files found.")
-                continue
-            for entry in entries:
-                header = entry.split("\n", 1)[0]
-                print(f" - {header}")
-            label = "types-" + "-".join(
-                e.lstrip(".").replace("*", "star") for e in exts
-            )
-            write_output_file(entries, label)
-        else:
-            target_path = resolve_path_query(SRC_DIR, q)
-            if not target_path:
-                target_path = find_directory_by_name(SRC_DIR, q)
-            if not target_path:
-                print(f"⚠️ Folder '{q}' not found. Try again with a more specific path.")
-                continue
-            rel_label = os.path.relpath(target_path, SRC_DIR).replace(os.sep, "_")
-            print(
-                f"\n📄 Scanning files under '{os.path.relpath(target_path, SRC_DIR)}'...\n"
-            )
-            entries = collect_file_contents(target_path)
-            if not entries:
-                print("⚠️ No files found in this folder.")
-                continue
-            for entry in entries:
-                header = entry.split("\n", 1)[0]
-                print(f" - {header}")
-            write_output_file(entries, rel_label)
+        run_profiled(q, run_query, q)
 
 
 if __name__ == "__main__":
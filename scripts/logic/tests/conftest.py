@@ -0,0 +1,53 @@
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scan_codebase as scan
+
+STATE = (
+    "SETTINGS",
+    "IGNORE_ENGINES",
+    "SNAPSHOTS",
+    "SNAPSHOT_CACHE",
+    "CONTENT_CACHE",
+    "TOKEN_CACHE",
+    "READ_STATS",
+    "LAST_BUNDLE",
+    "WORKSPACES",
+    "IMPORT_GRAPH",
+    "TRIGRAM_INDEX",
+)
+PRISTINE = {name: copy.deepcopy(getattr(scan, name)) for name in STATE}
+
+
+def reset_state(monkeypatch):
+    for name in STATE:
+        monkeypatch.setattr(scan, name, copy.deepcopy(PRISTINE[name]))
+
+
+@pytest.fixture
+def tmp_tree(tmp_path, monkeypatch):
+    root = tmp_path / "project"
+    (root / "src").mkdir(parents=True)
+    (tmp_path / "out").mkdir()
+    monkeypatch.setattr(scan, "PROJECT_ROOT", str(root))
+    monkeypatch.setattr(scan, "SRC_DIR", str(root / "src"))
+    monkeypatch.setattr(scan, "OUTPUT_DIR", str(tmp_path / "out"))
+    monkeypatch.setattr(scan, "CACHE_DIR", str(tmp_path / "cache"))
+    reset_state(monkeypatch)
+
+    def write(files):
+        for rel, text in files.items():
+            path = root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text, encoding="utf-8")
+        return root
+
+    write.root = root
+    write.out = tmp_path / "out"
+    write.restart = lambda: reset_state(monkeypatch)
+    return write
@@ -0,0 +1,103 @@
+import json
+import zipfile
+
+import scan_codebase as scan
+
+
+def bundle_texts(out):
+    return [p.read_text(encoding="utf-8") for p in sorted(out.glob("*-part-*.txt"))]
+
+
+def write_sized_files(tmp_tree, sizes):
+    tmp_tree({f"src/f{i}.ts": f"// {'x' * size}\n" for i, size in enumerate(sizes)})
+
+
+def test_pack_modes_keep_every_file_within_the_limit(tmp_tree, monkeypatch):
+    monkeypatch.setattr(scan, "SOFT_LIMIT", 300)
+    monkeypatch.setattr(scan, "HARD_LIMIT", 400)
+    sizes = [250, 40, 180, 120, 300, 60, 200, 90]
+    write_sized_files(tmp_tree, sizes)
+    counts = {}
+    for mode in scan.PACK_MODES:
+        for old in tmp_tree.out.glob("*.txt"):
+            old.unlink()
+        scan.SETTINGS["pack"] = mode
+        scan.write_codebase_parts()
+        texts = bundle_texts(tmp_tree.out)
+        headers = [h for text in texts for h in scan.ENTRY_HEADER_RE.findall(text)]
+        assert sorted(headers) == sorted(f"f{i}.ts" for i in range(len(sizes)))
+        assert all(scan.utf8_len(text) <= 400 for text in texts)
+        counts[mode] = len(texts)
+        if mode == "ordered":
+            assert headers == [f"f{i}.ts" for i in range(len(sizes))]
+    assert counts["ffd"] <= counts["ordered"] < counts["greedy"]
+
+
+def test_parallel_reads_match_serial_order(tmp_tree, monkeypatch):
+    monkeypatch.setattr(scan, "HARD_LIMIT", 200)
+    tmp_tree(
+        {
+            f"src/f{i}.ts": "// line\n" * lines
+            for i, lines in enumerate([3, 60, 1, 9, 40])
+        }
+    )
+    scan.SETTINGS["workers"] = 1
+    serial = [(b["header"], b["bytes"]) for b in scan.collect_codebase_blocks()]
+    tmp_tree.restart()
+    scan.SETTINGS["workers"] = 4
+    parallel = [(b["header"], b["bytes"]) for b in scan.collect_codebase_blocks()]
+    assert parallel == serial
+    assert len(serial) > 5
+
+
+def test_identical_files_become_stubs(tmp_tree):
+    body = "export const shared = 'same body';\n" * 5
+    tmp_tree({"src/a.ts": body, "src/b.ts": body, "src/c.ts": "export const c = 1;\n"})
+    scan.write_codebase_parts()
+    (text,) = bundle_texts(tmp_tree.out)
+    assert text.count("export const shared") == 5
+    assert "// --- b.ts --- (identical to a.ts)" in text
+    assert "export const c = 1;" in text
+
+
+def test_dedupe_can_be_turned_off(tmp_tree):
+    body = "export const shared = 'same body';\n"
+    tmp_tree({"src/a.ts": body, "src/b.ts": body})
+    scan.SETTINGS["dedupe"] = False
+    scan.write_codebase_parts()
+    (text,) = bundle_texts(tmp_tree.out)
+    assert text.count("export const shared") == 2
+    assert "identical to" not in text
+
+
+def read_index(out, fmt):
+    (archive,) = out.glob(f"*-codebase.{fmt}")
+    (index,) = out.glob("*-codebase.index.json")
+    return archive, json.loads(index.read_text(encoding="utf-8"))
+
+
+def test_jsonl_index_seeks_to_each_file(tmp_tree):
+    tmp_tree({"src/a.ts": "export const a = 1;\n", "src/b/c.tsx": "export default 2\n"})
+    scan.SETTINGS["format"] = "jsonl"
+    scan.write_codebase_parts()
+    archive, index = read_index(tmp_tree.out, "jsonl")
+    assert sorted(index["files"]) == ["a.ts", "b/c.tsx"]
+    with open(archive, "rb") as f:
+        for rel, (entry,) in index["files"].items():
+            f.seek(entry["offset"])
+            record = json.loads(f.read(entry["length"]))
+            assert record["file"] == rel
+            assert record["text"].startswith(f"// --- {rel} ---")
+
+
+def test_zip_index_slices_part_members(tmp_tree):
+    tmp_tree({"src/a.ts": "export const a = 1;\n", "src/b.ts": "export const b = 2;\n"})
+    scan.SETTINGS["format"] = "zip"
+    scan.write_codebase_parts()
+    archive, index = read_index(tmp_tree.out, "zip")
+    with zipfile.ZipFile(archive) as zf:
+        assert json.loads(zf.read("index.json"))["files"] == index["files"]
+        for rel, (entry,) in index["files"].items():
+            data = zf.read(scan.archive_member(entry["part"]))
+            text = data[entry["offset"] : entry["offset"] + entry["length"]]
+            assert text.decode("utf-8").startswith(f"// --- {rel} ---")
@@ -0,0 +1,88 @@
+from scan_codebase import compact_lines, parse_symbols
+
+
+def test_comments_and_blank_runs_are_dropped():
+    lines = [
+        "// header",
+        "const a = 1; // trailing",
+        "",
+        "",
+        "/* block */ const b = 2;",
+        "/*",
+        " * multi",
+        " */",
+        "const c = 3;",
+    ]
+    assert compact_lines(lines, "a.ts") == [
+        "const a = 1;",
+        "const b = 2;",
+        "const c = 3;",
+    ]
+
+
+def test_strings_keep_comment_markers():
+    lines = [
+        "const url = 'http://example.com'; // drop",
+        'const glob = "src/**/*.ts";',
+        "const t = `// not a comment`;",
+    ]
+    assert compact_lines(lines, "a.ts") == [
+        "const url = 'http://example.com';",
+        'const glob = "src/**/*.ts";',
+        "const t = `// not a comment`;",
+    ]
+
+
+def test_jsx_text_keeps_urls():
+    lines = [
+        "export const About = () => (",
+        "  <p>Visit http://example.com for more</p> // text",
+        "  <p>Don't miss https://example.com/docs</p>",
+        ");",
+    ]
+    assert compact_lines(lines, "About.tsx") == [
+        "export const About = () => (",
+        "<p>Visit http://example.com for more</p> // text",
+        "<p>Don't miss https://example.com/docs</p>",
+        ");",
+    ]
+
+
+def test_jsx_code_comments_are_dropped():
+    lines = [
+        "const items: Array<Item> = []; // drop",
+        "const f = () => 1; // drop",
+        "render(<List items={items} />);// drop",
+    ]
+    assert compact_lines(lines, "List.jsx") == [
+        "const items: Array<Item> = [];",
+        "const f = () => 1;",
+        "render(<List items={items} />);",
+    ]
+
+
+def test_css_keeps_line_comment_markers():
+    lines = ["a { background: url(//cdn.example.com/x.png); } /* drop */"]
+    assert compact_lines(lines, "a.css") == [
+        "a { background: url(//cdn.example.com/x.png); }"
+    ]
+
+
+def test_regex_literals_are_tokens():
+    lines = [
+        "const r = /'/; const u = 'http://x.com'; // drop",
+        "const s = a.replace(/\\/\\/+/g, '/'); // drop",
+        'return /"/.test(s); // drop',
+        "const half = w  /  2; // drop",
+    ]
+    assert compact_lines(lines, "a.ts") == [
+        "const r = /'/; const u = 'http://x.com';",
+        "const s = a.replace(/\\/\\/+/g, '/');",
+        'return /"/.test(s);',
+        "const half = w / 2;",
+    ]
+
+
+def test_symbols_skip_regex_quotes():
+    text = "const r = /'/;\nexport const url = 'http://x.com';\nexport function f() {}"
+    assert parse_symbols(text)["exports"] == [["url", "url"], ["f", "f"]]
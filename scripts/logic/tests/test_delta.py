@@ -0,0 +1,70 @@
+import shutil
+import subprocess
+
+import pytest
+
+import scan_codebase as scan
+
+
+def delta_text(out):
+    return "".join(
+        p.read_text(encoding="utf-8") for p in sorted(out.glob("*-delta-part-*.txt"))
+    )
+
+
+def test_delta_against_the_last_manifest(tmp_tree):
+    root = tmp_tree(
+        {
+            "src/a.ts": "export const a = 1;\n",
+            "src/b.ts": "export const b = 2;\n",
+            "src/c.ts": "export const c = 3;\n",
+        }
+    )
+    scan.write_codebase_parts()
+    (root / "src/a.ts").write_text("export const a = 10;\n", encoding="utf-8")
+    (root / "src/b.ts").unlink()
+    (root / "src/d.ts").write_text("export const d = 4;\n", encoding="utf-8")
+    tmp_tree.restart()
+    scan.write_delta_parts()
+    text = delta_text(tmp_tree.out)
+    assert "added (1):\n  d.ts\nmodified (1):\n  a.ts\ndeleted (1):\n  b.ts" in text
+    assert "export const a = 10;" in text
+    assert "export const d = 4;" in text
+    assert "// --- c.ts ---" not in text
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_delta_against_a_git_revision(tmp_tree):
+    root = tmp_tree(
+        {"src/a.ts": "export const a = 1;\n", "src/b.ts": "export const b = 2;\n"}
+    )
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@example.com"]
+    subprocess.run(git + ["init", "-q"], cwd=root, check=True)
+    subprocess.run(git + ["add", "."], cwd=root, check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "init"], cwd=root, check=True)
+    (root / "src/a.ts").write_text("export const a = 10;\n", encoding="utf-8")
+    (root / "src/new.ts").write_text("export const n = 0;\n", encoding="utf-8")
+    scan.write_delta_parts("HEAD")
+    text = delta_text(tmp_tree.out)
+    assert "// --- delta since git HEAD ---" in text
+    assert "added (1):\n  new.ts\nmodified (1):\n  a.ts\ndeleted (0):" in text
+    assert "// --- b.ts ---" not in text
+
+
+def test_delta_and_since_take_a_revision_in_both_modes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scan, "write_delta_parts", lambda rev=None: calls.append(rev))
+    for q in ("delta", "delta HEAD~1", "since HEAD~2"):
+        scan.run_query(q)
+    parser = scan.build_arg_parser()
+    words = ["delta", "delta", "main", "since", "v1", "delta", "codebase"]
+    queries = scan.group_batch_queries(parser, words)
+    assert queries[:4] == [
+        ("delta", []),
+        ("delta", ["main"]),
+        ("since", ["v1"]),
+        ("delta", []),
+    ]
+    for name, args in queries[:4]:
+        scan.BATCH_QUERIES[name][1](*args)
+    assert calls == [None, "HEAD~1", "HEAD~2", None, "main", "v1", None]
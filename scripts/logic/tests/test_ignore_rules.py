@@ -0,0 +1,79 @@
+from scan_codebase import (
+    compile_ignore_rules,
+    ignore_rule_regex,
+    is_ignored,
+    iter_src_files,
+)
+
+
+def engine_for(*lines):
+    rules = [rule for rule in map(ignore_rule_regex, lines) if rule]
+    return {"groups": compile_ignore_rules(rules)}
+
+
+def test_blank_and_comment_lines_have_no_rule():
+    assert ignore_rule_regex("") is None
+    assert ignore_rule_regex("   \n") is None
+    assert ignore_rule_regex("# comment") is None
+    assert ignore_rule_regex("/") is None
+
+
+def test_rule_regex_forms():
+    assert ignore_rule_regex("node_modules\n") == (False, "(?:.*/)?node_modules/?")
+    assert ignore_rule_regex("build/") == (False, "(?:.*/)?build/")
+    assert ignore_rule_regex("!keep.log") == (True, r"(?:.*/)?keep\.log/?")
+    assert ignore_rule_regex("/root.txt") == (False, r"root\.txt/?")
+    assert ignore_rule_regex(r"\#hash") == (False, r"(?:.*/)?\#hash/?")
+    assert ignore_rule_regex("trailing   ") == (False, "(?:.*/)?trailing/?")
+
+
+def test_unanchored_names_match_at_any_depth():
+    engine = engine_for("*.log", "node_modules")
+    assert is_ignored(engine, "a.log", False)
+    assert is_ignored(engine, "x/y/a.log", False)
+    assert is_ignored(engine, "pkg/node_modules", True)
+    assert not is_ignored(engine, "a.log.txt", False)
+
+
+def test_anchored_and_nested_patterns():
+    engine = engine_for("/root.txt", "docs/**/*.md")
+    assert is_ignored(engine, "root.txt", False)
+    assert not is_ignored(engine, "sub/root.txt", False)
+    assert is_ignored(engine, "docs/c.md", False)
+    assert is_ignored(engine, "docs/a/b/c.md", False)
+    assert not is_ignored(engine, "other/docs/c.md", False)
+
+
+def test_directory_only_rules_skip_files():
+    engine = engine_for("build/")
+    assert is_ignored(engine, "build", True)
+    assert is_ignored(engine, "src/build", True)
+    assert not is_ignored(engine, "build", False)
+
+
+def test_later_rules_win():
+    engine = engine_for("*.log", "!keep.log")
+    assert not is_ignored(engine, "x/keep.log", False)
+    assert is_ignored(engine, "x/drop.log", False)
+    engine = engine_for("!keep.log", "*.log")
+    assert is_ignored(engine, "keep.log", False)
+
+
+def test_character_classes():
+    engine = engine_for("a[!b].txt")
+    assert is_ignored(engine, "ac.txt", False)
+    assert not is_ignored(engine, "ab.txt", False)
+
+
+def test_walk_honours_gitignore(tmp_tree):
+    tmp_tree(
+        {
+            ".gitignore": "generated/\n*.log\n!keep.log\n",
+            "src/app/page.tsx": "export default 1\n",
+            "src/generated/api.ts": "export const a = 1\n",
+            "src/node_modules/x/index.js": "module.exports = 1\n",
+            "src/drop.log": "x\n",
+            "src/keep.log": "x\n",
+        }
+    )
+    assert sorted(rel for rel, _ in iter_src_files()) == ["app/page.tsx", "keep.log"]
@@ -0,0 +1,87 @@
+from scan_codebase import parse_import_specs
+
+
+def test_static_dynamic_and_require_forms():
+    text = "\n".join(
+        [
+            "import React from 'react';",
+            'import { a, b as c } from "./ab";',
+            "import type { T } from '@/lib/types';",
+            "import './side-effect.css';",
+            "export * from './barrel';",
+            "export { x } from './x';",
+            "const lazy = import('./lazy');",
+            "const fs = require('fs');",
+        ]
+    )
+    assert parse_import_specs(text) == [
+        "react",
+        "./ab",
+        "@/lib/types",
+        "./side-effect.css",
+        "./barrel",
+        "./x",
+        "./lazy",
+        "fs",
+    ]
+
+
+def test_multiline_import_clause():
+    text = "import {\n  one,\n  two,\n} from './many';\n"
+    assert parse_import_specs(text) == ["./many"]
+
+
+def test_comments_and_strings_are_skipped():
+    text = "\n".join(
+        [
+            "// import a from './commented';",
+            "/* import b from './block'; */",
+            "const s = \"import c from './in-string'\";",
+            "const t = `import d from './in-template'`;",
+            "import real from './real';",
+        ]
+    )
+    assert parse_import_specs(text) == ["./real"]
+
+
+def test_keywords_inside_identifiers_are_not_imports():
+    text = "reimport('./no'); obj.required('./no2'); myexport from './no3';"
+    assert parse_import_specs(text) == []
+
+
+def test_regex_literal_with_quotes_does_not_hide_imports():
+    text = "const re = /['\"`]/g;\nimport ok from './ok';\n"
+    assert parse_import_specs(text) == ["./ok"]
+
+
+def test_division_is_not_a_regex_literal():
+    text = "const r = a / b; const q = c / d;\nimport ok from './ok';\n"
+    assert parse_import_specs(text) == ["./ok"]
+
+
+def test_unmatched_backtick_in_jsx_text_stops_at_next_import():
+    text = (
+        "const A = () => <p>Use ` here</p>;\nimport x from './yes';\nconst t = `a`;\n"
+    )
+    assert parse_import_specs(text) == ["./yes"]
+
+
+def test_unterminated_string_stops_at_line_end():
+    text = "const s = 'oops;\nimport y from './after';\n"
+    assert parse_import_specs(text) == ["./after"]
+
+
+def test_large_input_without_imports_is_linear():
+    text = "'a\\'" * 20000 + "`" + "x\\`" * 20000 + "/[/]" * 20000
+    assert parse_import_specs(text + "\nimport z from './z';") == ["./z"]
+
+
+def test_type_reexports_template_imports_and_spaced_require():
+    text = "\n".join(
+        [
+            'export type { X } from "./types";',
+            "const m = await import(`./lazy`);",
+            'const r = require ("./r");',
+        ]
+    )
+    assert parse_import_specs(text) == ["./types", "./lazy", "./r"]
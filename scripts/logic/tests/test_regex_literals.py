@@ -0,0 +1,28 @@
+from scan_codebase import regex_literals
+
+
+def test_counted_quantifiers_end_the_run():
+    assert regex_literals(r"foo\d{1,3}bar") == ["foo", "bar"]
+    assert regex_literals(r"foo{2,}barbaz") == ["barbaz"]
+    assert regex_literals(r"items{,3}done") == ["item", "done"]
+    assert regex_literals(r"[a-z]{3}qux") == ["qux"]
+
+
+def test_brace_without_count_is_not_a_quantifier():
+    assert regex_literals(r"abc{x}def") == ["abc", "def"]
+
+
+def test_escaped_metacharacters_are_literal():
+    assert regex_literals(r"foo\.bar") == ["foo.bar"]
+    assert regex_literals(r"\bword\s+next") == ["word", "next"]
+
+
+def test_optional_characters_split_the_run():
+    assert regex_literals("colou?rful") == ["colo", "rful"]
+    assert regex_literals("ab.cde*f") == []
+
+
+def test_groups_classes_and_alternation_are_not_required():
+    assert regex_literals("(inner)outer") == ["outer"]
+    assert regex_literals("[xyz]+tail") == ["tail"]
+    assert regex_literals("abc|def") == []
@@ -0,0 +1,46 @@
+from scan_codebase import line_sizes, split_line_ranges
+
+
+def assert_covers(ranges, n):
+    assert ranges[0][0] == 1 and ranges[-1][1] == n
+    for prev, cur in zip(ranges, ranges[1:]):
+        assert cur[0] == prev[1] + 1
+
+
+def test_ranges_cover_every_line_within_budget():
+    lines = ["a" * 9] * 10
+    ranges = split_line_ranges(lines, "x.ts", budget=30)
+    assert ranges == [[1, 3, 30], [4, 6, 30], [7, 9, 30], [10, 10, 10]]
+    assert_covers(ranges, len(lines))
+
+
+def test_splits_prefer_blank_lines_then_declarations():
+    lines = [
+        "const a = 1;",
+        "const b = 2;",
+        "",
+        "function f() {",
+        "  return 1;",
+        "}",
+        "export const z = 3;",
+        "x();",
+    ]
+    ranges = split_line_ranges(lines, "x.ts", budget=40)
+    assert [r[:2] for r in ranges] == [[1, 3], [4, 6], [7, 8]]
+    sizes = line_sizes(lines)
+    assert [r[2] for r in ranges] == [sum(sizes[a - 1 : e]) for a, e, _ in ranges]
+
+
+def test_oversized_line_gets_its_own_range():
+    ranges = split_line_ranges(["x" * 100, "y"], "x.ts", budget=40)
+    assert ranges == [[1, 1, 101], [2, 2, 2]]
+
+
+def test_sizes_count_utf8_bytes():
+    ranges = split_line_ranges(["é" * 10, "é" * 10], "x.ts", budget=25)
+    assert ranges == [[1, 1, 21], [2, 2, 21]]
+
+
+def test_precomputed_sizes_and_marks():
+    ranges = split_line_ranges(None, "x.ts", sizes=[10] * 5, budget=25, marks=[0] * 5)
+    assert ranges == [[1, 2, 20], [3, 4, 20], [5, 5, 10]]
@@ -0,0 +1,37 @@
+import scan_codebase as scan
+
+
+def test_symbol_trace_follows_barrels_and_aliases(tmp_tree):
+    tmp_tree(
+        {
+            "src/lib/button.tsx": "export function Button() {}\nexport const size = 1\n",
+            "src/components/index.ts": "export { Button } from '../lib/button'\n",
+            "src/app/page.tsx": "import { Button as B } from '@/components'\n",
+            "src/app/sizes.ts": "import { size } from '../lib/button'\n",
+            "src/app/other.ts": "import { Other } from './missing'\n",
+        }
+    )
+    assert scan.symbol_paths("Button") == [
+        "lib/button.tsx",
+        "app/page.tsx",
+        "components/index.ts",
+    ]
+    assert scan.symbol_paths("size") == ["lib/button.tsx", "app/sizes.ts"]
+    assert scan.symbol_paths("Other") == []
+
+
+def test_parse_symbols_reads_exports_reexports_and_uses():
+    text = "\n".join(
+        [
+            "import Card, { Grid as G } from './card'",
+            "export * from './all'",
+            "export { x as y } from './x'",
+            "export default class Page {}",
+            "export const a = 1",
+        ]
+    )
+    assert scan.parse_symbols(text) == {
+        "exports": [["default", "Page"], ["a", "a"]],
+        "reexports": [["./all", "*", "*"], ["./x", "x", "y"]],
+        "uses": [["./card", "Grid"], ["./card", "default"]],
+    }
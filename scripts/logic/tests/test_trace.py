@@ -0,0 +1,39 @@
+import scan_codebase as scan
+
+GRAPH = {
+    "src/page.tsx": "import { a } from './a'\nimport { b } from '@/b'\n",
+    "src/a.ts": "import { c } from './c'\nexport const a = c\n",
+    "src/c.ts": "import { a } from './a'\nexport const c = 1\n",
+    "src/b.ts": "export * from './d'\nexport const b = 2\n",
+    "src/d.ts": "export const d = 3\n",
+    "src/other.ts": "const b = require('./b')\n",
+}
+
+
+def test_forward_and_reverse_traces_keep_bfs_order(tmp_tree):
+    tmp_tree(GRAPH)
+    forward = scan.trace_paths(["page.tsx"], "forward")
+    assert forward == ["page.tsx", "a.ts", "b.ts", "c.ts", "d.ts"]
+    assert scan.trace_paths(["page.tsx"], "forward", depth=1) == forward[:3]
+    reverse = scan.trace_paths(["d.ts"], "reverse")
+    assert reverse == ["d.ts", "b.ts", "other.ts", "page.tsx"]
+    both = scan.trace_paths(["b.ts"], "both")
+    assert both == ["b.ts", "other.ts", "page.tsx", "d.ts"]
+
+
+def test_cycles_are_limited_to_the_trace(tmp_tree):
+    tmp_tree(GRAPH)
+    indexes = scan.build_import_indexes()
+    cycles = scan.trace_cycles(["page.tsx"], "forward", indexes)
+    assert [sorted(comp) for comp in cycles] == [["a.ts", "c.ts"]]
+    assert scan.trace_cycles(["b.ts"], "forward", indexes) == []
+
+
+def test_indexes_are_reused_until_the_tree_changes(tmp_tree):
+    root = tmp_tree(GRAPH)
+    indexes = scan.build_import_indexes()
+    assert scan.build_import_indexes() is indexes
+    (root / "src/e.ts").write_text("import './d'\n", encoding="utf-8")
+    assert scan.build_import_indexes() is not indexes
+    reverse = scan.trace_paths(["d.ts"], "reverse")
+    assert reverse == ["d.ts", "b.ts", "e.ts", "other.ts", "page.tsx"]
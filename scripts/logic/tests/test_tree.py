@@ -0,0 +1,20 @@
+import scan_codebase as scan
+
+
+def test_bare_number_is_a_folder_when_one_exists(tmp_tree):
+    tmp_tree({"src/2025/post.md": "# post\n", "src/lib/util.ts": "export {}\n"})
+    default = scan.SETTINGS["tree"]
+    assert scan.parse_tree_args("2025") == ("2025", default)
+    assert scan.parse_tree_args("2024") == ("", 2024)
+    assert scan.parse_tree_args("2025 3") == ("2025", 3)
+    assert scan.parse_tree_args("lib 4") == ("lib", 4)
+    assert scan.parse_tree_args("-d 2025") == ("", 2025)
+    assert scan.parse_tree_args("lib --depth 1") == ("lib", 1)
+
+
+def test_tree_command_lists_a_numbered_folder(tmp_tree, capsys):
+    tmp_tree({"src/2025/post.md": "# post\n", "src/lib/util.ts": "export {}\n"})
+    scan.run_tree_command("2025")
+    out = capsys.readouterr().out
+    assert "post.md" in out
+    assert "util.ts" not in out
@@ -0,0 +1,44 @@
+import scan_codebase as scan
+
+
+def write_three_parts(tmp_tree, monkeypatch):
+    monkeypatch.setattr(scan, "SOFT_LIMIT", 300)
+    monkeypatch.setattr(scan, "HARD_LIMIT", 400)
+    root = tmp_tree({f"src/f{i}.ts": f"// {str(i) * 200}\n" for i in range(3)})
+    scan.write_codebase_parts()
+    parts = sorted(tmp_tree.out.glob("*-codebase-part-*.txt"))
+    assert len(parts) == 3
+    return root, parts
+
+
+def test_rewrite_touches_only_changed_parts(tmp_tree, monkeypatch):
+    root, parts = write_three_parts(tmp_tree, monkeypatch)
+    before = [p.read_text(encoding="utf-8") for p in parts]
+    snap = scan.get_snapshot()
+    (root / "src/f2.ts").write_text(f"// changed {'z' * 150}\n", encoding="utf-8")
+    assert scan.poll_snapshot_changes(snap) == {"f2.ts"}
+    assert scan.rewrite_bundle(scan.LAST_BUNDLE["bundle"]) == (1, 3)
+    after = [p.read_text(encoding="utf-8") for p in parts]
+    assert after[:2] == before[:2]
+    assert "// changed" in after[2]
+
+
+def test_watch_loop_rewrites_after_an_edit(tmp_tree, monkeypatch, capsys):
+    root, parts = write_three_parts(tmp_tree, monkeypatch)
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+            (root / "src/f0.ts").write_text(
+                f"// edited {'z' * 150}\n", encoding="utf-8"
+            )
+        elif len(sleeps) > 2:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(scan.time, "sleep", fake_sleep)
+    scan.run_watch()
+    out = capsys.readouterr().out
+    assert "1 file(s) changed, rewrote 1 of 3 part(s)" in out
+    assert "// edited" in parts[0].read_text(encoding="utf-8")
+    assert sleeps[:2] == [scan.WATCH_INTERVAL, scan.WATCH_DEBOUNCE]
@@ -0,0 +1,48 @@
+import json
+
+import scan_codebase as scan
+
+
+def write_monorepo(tmp_tree):
+    return tmp_tree(
+        {
+            "package.json": json.dumps({"private": True, "workspaces": ["packages/*"]}),
+            "packages/ui/package.json": json.dumps(
+                {"name": "@acme/ui", "main": "src/index.ts"}
+            ),
+            "packages/ui/src/index.ts": "export { Button } from './button'\n",
+            "packages/ui/src/button.tsx": "export function Button() {}\n",
+            "packages/app/package.json": json.dumps({"name": "app"}),
+            "packages/app/src/page.tsx": "import { Button } from '@acme/ui'\n",
+            "packages/app/src/node_modules/x.js": "module.exports = 1\n",
+        }
+    )
+
+
+def test_discovers_packages_and_their_entries(tmp_tree):
+    write_monorepo(tmp_tree)
+    packages = scan.discover_workspaces()
+    assert [(p["dir"], p["name"], p["prefix"]) for p in packages] == [
+        ("packages/app", "app", "packages/app/src"),
+        ("packages/ui", "@acme/ui", "packages/ui/src"),
+    ]
+    assert [p["entries"] for p in packages] == [["index"], ["index"]]
+
+
+def test_cross_package_imports_join_the_graph(tmp_tree):
+    write_monorepo(tmp_tree)
+    scan.SETTINGS["processes"] = 2
+    packages = scan.discover_workspaces()
+    results = scan.scan_workspaces(packages)
+    assert [r["paths"] for r in results] == [
+        ["page.tsx"],
+        ["button.tsx", "index.ts"],
+    ]
+    imports, importers = scan.WORKSPACES["graph"]
+    assert imports["packages/app/src/page.tsx"] == {"packages/ui/src/index.ts"}
+    assert importers["packages/ui/src/button.tsx"] == {"packages/ui/src/index.ts"}
+    assert scan.WORKSPACES["links"] == {(0, 1): 1}
+    scan.write_workspace_parts()
+    (text,) = [p.read_text(encoding="utf-8") for p in tmp_tree.out.glob("*.txt")]
+    assert "packages/app -> packages/ui  (1)" in text
+    assert "// --- packages/ui/src/button.tsx ---" in text